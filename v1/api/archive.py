@@ -0,0 +1,250 @@
+import glob
+import mmap
+import os
+import struct
+import sys
+from array import array
+import codec
+import config
+import locks
+import records
+import storage_utils
+import timestamps
+
+# Columnar archive of closed sessions, one per lot next to its JSON file
+# (p{lid}-sessions.archive). A closed session never changes, so old ones are
+# rolled out of the JSON file into fixed-width columns that are memory-mapped
+# instead of parsed: start and stop epochs (int64) and the session id,
+# licence plate, user and any other fields as JSON (uint32 indexes into a
+# table of interned strings, 0 is None). The columns can be handed to NumPy
+# as they are (numpy.frombuffer) for analytics over years of history.
+#
+# Loading a lot merges its archive with its JSON file, which keeps the open
+# and recent sessions plus a null for every archived session deleted since
+# (see SessionData); saving writes only that live part. Sessions are rolled
+# into the archive by roll(), at startup with ARCHIVE_AFTER_DAYS or from
+# archive_sessions.py.
+#
+# Layout, little endian: magic, record count, string count; the started,
+# stopped, id, plate, user and extra columns; the string offsets (uint64, one
+# more than there are strings) and the strings' UTF-8 bytes.
+
+MAGIC = b"MPSARCH1"
+HEADER = struct.Struct("<8sQQ")
+FIELDS = ("licenseplate", "started", "stopped", "user", "started_ts", "stopped_ts")
+
+_archives = {}
+
+
+def archive_path(filename):
+    return filename[:-len('.json')] + '.archive'
+
+
+def is_sessions_file(filename):
+    return filename.startswith('data/pdata/') and filename.endswith('-sessions.json')
+
+
+def _column(view, offset, count, code):
+    size = array(code).itemsize
+    values = view[offset:offset + count * size]
+    if sys.byteorder == 'little':
+        return values.cast(code), offset + count * size
+    values = array(code, values.tobytes())
+    values.byteswap()
+    return values, offset + count * size
+
+
+class SessionArchive:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else b""
+        magic, count, string_count = HEADER.unpack_from(self.map) if len(self.map) >= HEADER.size else (None, 0, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a session archive")
+        view = memoryview(self.map)
+        offset = HEADER.size
+        self.started, offset = _column(view, offset, count, 'q')
+        self.stopped, offset = _column(view, offset, count, 'q')
+        self.sids, offset = _column(view, offset, count, 'I')
+        self.plates, offset = _column(view, offset, count, 'I')
+        self.users, offset = _column(view, offset, count, 'I')
+        self.extras, offset = _column(view, offset, count, 'I')
+        offsets, offset = _column(view, offset, string_count + 1, 'Q')
+        blob = self.map[offset:offset + offsets[string_count]]
+        bounds = offsets.tolist()
+        text = blob.decode("utf-8")
+        if len(text) == len(blob):
+            # ASCII: byte offsets are character offsets.
+            self.strings = [None] + [text[bounds[i]:bounds[i + 1]] for i in range(1, string_count)]
+        else:
+            self.strings = [None] + [blob[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(1, string_count)]
+        self._records = None
+
+    def __len__(self):
+        return len(self.started)
+
+    def records(self):
+        # sid -> session dict, as the JSON file held it (plus the *_ts fields).
+        # Built once per archive; callers copy the dict, not the sessions.
+        if self._records is None:
+            self._records = self._materialize()
+        return self._records
+
+    def _materialize(self):
+        strings = self.strings
+        started, stopped = self.started.tolist(), self.stopped.tolist()
+        compact = records.Session.from_dict if config.COMPACT_RECORDS else None
+        sessions = {}
+        for start, stop, started_text, stopped_text, sid, plate, user, extra in zip(started, stopped, timestamps.to_texts(started), timestamps.to_texts(stopped), self.sids.tolist(), self.plates.tolist(), self.users.tolist(), self.extras.tolist()):
+            record = {"licenseplate": strings[plate], "started": started_text, "stopped": stopped_text, "user": strings[user], "started_ts": start, "stopped_ts": stop}
+            if extra:
+                record.update(codec.loads(strings[extra]))
+            sessions[strings[sid]] = compact(record) if compact else record
+        return sessions
+
+
+def open_archive(filename):
+    # The lot's archive, mapped once per version of the file; None without one.
+    path = archive_path(filename)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        _archives.pop(path, None)
+        return None
+    version = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    cached = _archives.get(path)
+    if cached is None or cached[0] != version:
+        cached = _archives[path] = (version, SessionArchive(path))
+    return cached[1]
+
+
+def write(path, sessions):
+    # Writes (sid, session) pairs of closed sessions as an archive.
+    indexes = {None: 0}
+    strings = [b""]
+
+    def intern(value):
+        index = indexes.get(value)
+        if index is None:
+            index = indexes[value] = len(strings)
+            strings.append(value.encode("utf-8"))
+        return index
+
+    started, stopped = array('q'), array('q')
+    sids, plates, users, extras = array('I'), array('I'), array('I'), array('I')
+    for sid, session in sessions:
+        start, stop = timestamps.epoch(session, "started"), timestamps.epoch(session, "stopped")
+        # Whatever the columns do not reproduce exactly goes with the extras.
+        extra = {key: value for key, value in session.items() if key not in FIELDS}
+        for field, seconds in (("started", start), ("stopped", stop)):
+            if session.get(field) != timestamps.to_text(seconds):
+                extra[field] = session.get(field)
+        for field in ("licenseplate", "user"):
+            if session.get(field) is not None and not isinstance(session.get(field), str):
+                extra[field] = session.get(field)
+        started.append(start)
+        stopped.append(stop)
+        sids.append(intern(sid))
+        plates.append(intern(session.get("licenseplate") if isinstance(session.get("licenseplate"), str) else None))
+        users.append(intern(session.get("user") if isinstance(session.get("user"), str) else None))
+        extras.append(intern(codec.dumps(extra)) if extra else 0)
+    offsets = array('Q', [0])
+    for value in strings:
+        offsets.append(offsets[-1] + len(value))
+    columns = (started, stopped, sids, plates, users, extras, offsets)
+    if sys.byteorder != 'little':
+        for column in columns:
+            column.byteswap()
+
+    def dump(file):
+        file.write(HEADER.pack(MAGIC, len(started), len(strings)))
+        for column in columns:
+            column.tofile(file)
+        file.write(b"".join(strings))
+
+    storage_utils.atomic_write(path, dump, binary=True)
+
+
+class SessionData(dict):
+    # A lot's sessions: its archived sessions merged with its JSON file.
+    # Changes go through item assignment, del and pop, which keep live, the
+    # contents of the JSON file, up to date: sessions that are not archived
+    # or replace an archived one, and None for deleted archived sessions.
+
+    def __init__(self, archived, live):
+        super().__init__(archived)
+        self.live = {}
+        self.replaced = set()
+        for sid, session in live.items():
+            if session is None:
+                if super().pop(sid, None) is not None:
+                    self.live[sid] = None
+            else:
+                self[sid] = session
+
+    def __setitem__(self, sid, session):
+        if sid in self.replaced or (sid in self and sid not in self.live) or (sid in self.live and self.live[sid] is None):
+            self.replaced.add(sid)
+        super().__setitem__(sid, session)
+        self.live[sid] = session
+
+    def __delitem__(self, sid):
+        super().__delitem__(sid)
+        self._forget(sid)
+
+    def pop(self, sid, *default):
+        if sid not in self:
+            return super().pop(sid, *default)
+        session = super().pop(sid)
+        self._forget(sid)
+        return session
+
+    def _forget(self, sid):
+        if sid not in self.live or sid in self.replaced:
+            self.live[sid] = None
+            self.replaced.discard(sid)
+        else:
+            del self.live[sid]
+
+
+def merge(filename, data):
+    # The lot's sessions with its archive merged in; data is the JSON file.
+    archived = open_archive(filename) if is_sessions_file(filename) else None
+    if archived is None:
+        return data
+    return SessionData(archived.records(), data if isinstance(data, dict) else {})
+
+
+def document(data):
+    # What the JSON file of a dataset holds.
+    return data.live if isinstance(data, SessionData) else data
+
+
+def roll(filename, before):
+    # Moves the sessions of a lot stopped before `before` (epoch seconds) into
+    # its archive; returns how many were moved.
+    with locks.file_locked(filename):
+        data = storage_utils.load_data(filename)
+        if not isinstance(data, dict):
+            return 0
+        moved, kept = {}, {}
+        for sid, session in data.items():
+            stopped = timestamps.epoch(session, "stopped") if session.get("stopped") else None
+            if stopped is not None and stopped < before and timestamps.epoch(session, "started") is not None:
+                moved[sid] = session
+            else:
+                kept[sid] = session
+        live = document(data)
+        count = sum(1 for sid in moved if sid in live)
+        if not count and None not in live.values():
+            return 0
+        # The archive first: until the JSON file is rewritten its sessions
+        # are in both, and the JSON copy wins.
+        write(archive_path(filename), moved.items())
+        storage_utils.save_data(filename, kept)
+        return count
+
+
+def roll_all(days):
+    before = timestamps.now() - days * 86400
+    return {filename: roll(filename, before) for filename in sorted(glob.glob('data/pdata/p*-sessions.json'))}
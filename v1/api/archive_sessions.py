@@ -0,0 +1,20 @@
+import sys
+import config
+import archive
+
+# Rolls the closed sessions stopped more than the given number of days ago
+# out of data/pdata/p*-sessions.json into the lots' columnar archives (see
+# archive.py). Run it with the server stopped; the server does the same at
+# startup when MOBYPARK_ARCHIVE_AFTER_DAYS is set.
+# Usage: python archive_sessions.py [days] [storage backend]
+
+
+def main(days):
+    for filename, count in archive.roll_all(days).items():
+        print(f"{filename}: {count} session(s) archived")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        config.STORAGE_BACKEND = sys.argv[2]
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else config.ARCHIVE_AFTER_DAYS or 30)
@@ -0,0 +1,119 @@
+import asyncio
+import io
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import config
+import responses
+
+# asyncio serving mode. The event loop owns the connections: it reads each
+# request head and body, hands the complete request to the regular
+# RequestHandler on a worker thread (the handlers, their locks and the
+# storage I/O are blocking) and writes the response back. Idle keep-alive
+# connections and slow clients therefore cost a coroutine, not a worker, so
+# thousands of gate terminals can stay connected. Connections are kept alive
+# as HTTP/1.1 allows and closed after KEEPALIVE_TIMEOUT seconds of idleness.
+
+MAX_HEAD = 64 * 1024
+
+
+class ResponseWriter:
+    # wfile of a handler running on a worker thread. Small responses are
+    # buffered and written by the loop once the handler returns; streamed
+    # bodies are passed to the loop every FLUSH_SIZE bytes, waiting for the
+    # client to drain them.
+
+    def __init__(self, loop, writer):
+        self.loop = loop
+        self.writer = writer
+        self.buffer = []
+        self.size = 0
+
+    def write(self, data):
+        self.buffer.append(bytes(data))
+        self.size += len(data)
+        if self.size >= responses.FLUSH_SIZE:
+            asyncio.run_coroutine_threadsafe(self.drain(), self.loop).result()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    async def drain(self):
+        data = b"".join(self.buffer)
+        self.buffer = []
+        self.size = 0
+        if data:
+            self.writer.write(data)
+            await self.writer.drain()
+
+
+def _content_length(head):
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            try:
+                return max(int(value), 0)
+            except ValueError:
+                return 0
+    return 0
+
+
+def _expects_continue(head):
+    return any(line.lower().replace(b" ", b"") == b"expect:100-continue" for line in head.split(b"\r\n")[1:])
+
+
+class AsyncServer:
+    def __init__(self, handler_class, workers):
+        # HTTP/1.1 so the handler keeps connections open unless asked not to;
+        # "Expect: 100-continue" is answered before the body is read.
+        self.handler_class = type("AsyncRequestHandler", (handler_class,), {
+            "protocol_version": "HTTP/1.1",
+            "handle_expect_100": lambda handler: True,
+        })
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def handle(self, request, writer, client_address):
+        handler = self.handler_class.__new__(self.handler_class)
+        handler.client_address = client_address
+        handler.server = self
+        handler.request = None
+        handler.rfile = io.BytesIO(request)
+        handler.wfile = ResponseWriter(self.loop, writer)
+        handler.close_connection = True
+        try:
+            handler.handle_one_request()
+        except Exception:
+            traceback.print_exc()
+            handler.close_connection = True
+        return handler
+
+    async def connection(self, reader, writer):
+        client_address = writer.get_extra_info("peername")
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), config.KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+                    break
+                length = _content_length(head)
+                if length and _expects_continue(head):
+                    writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+                body = await reader.readexactly(length) if length else b""
+                handler = await self.loop.run_in_executor(self.executor, self.handle, head + body, writer, client_address)
+                await handler.wfile.drain()
+                if handler.close_connection:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, sock):
+        self.loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self.connection, sock=sock, limit=MAX_HEAD)
+        async with server:
+            await server.serve_forever()
+
+
+def serve(sock, handler_class, workers):
+    asyncio.run(AsyncServer(handler_class, workers).serve(sock))
@@ -0,0 +1,79 @@
+import os
+import sys
+import tempfile
+import time
+import archive
+import repository
+import storage_utils
+import timestamps
+
+# Loading a lot, reloading it after another process changed it and starting
+# a session in it, with all sessions in the JSON file against closed sessions
+# rolled into the columnar archive, plus the file sizes.
+# Usage: python bench_archive.py [sessions...]
+
+FILENAME = 'data/pdata/p1-sessions.json'
+OPEN = 200
+
+
+def make_data(size):
+    begin = timestamps.now() - size * 600
+    sessions = {}
+    for i in range(1, size + 1):
+        session = {"licenseplate": f"XX-{i % 5000}", "user": f"user{i % 1000}"}
+        timestamps.stamp(session, "started", begin + i * 600)
+        session["stopped"] = None
+        if i <= size - OPEN:
+            timestamps.stamp(session, "stopped", begin + i * 600 + 3600)
+        sessions[str(i)] = session
+    storage_utils.write_json(FILENAME, sessions)
+    return sessions
+
+
+def start_session(n):
+    sessions = repository.load(FILENAME)
+    sid = str(len(sessions) + 1)
+    sessions[sid] = timestamps.stamp({"licenseplate": f"NEW-{n}", "stopped": None, "user": "bench"}, "started")
+    repository.save_record(FILENAME, sessions, sid)
+
+
+def measure(starts=20):
+    repository.datasets.clear()
+    archive._archives.clear()
+    begin = time.perf_counter()
+    repository.load(FILENAME)
+    loaded = time.perf_counter() - begin
+    begin = time.perf_counter()
+    for n in range(starts):
+        start_session(n)
+    started = (time.perf_counter() - begin) / starts
+    # The archive stays mapped; only the JSON file changed.
+    repository.datasets.clear()
+    begin = time.perf_counter()
+    repository.load(FILENAME)
+    return loaded * 1000, (time.perf_counter() - begin) * 1000, started * 1000
+
+
+def size_of(*paths):
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path)) / 2**20
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs('data/pdata')
+        print(f"{'sessions':>10} {'json load ms':>13} {'reload':>7} {'start ms':>9} {'MB':>6} {'archive load ms':>16} {'reload':>7} {'start ms':>9} {'MB':>6}")
+        for size in sizes:
+            make_data(size)
+            if os.path.exists(archive.archive_path(FILENAME)):
+                os.remove(archive.archive_path(FILENAME))
+            json_load, json_reload, json_start = measure()
+            json_size = size_of(FILENAME)
+            archive.roll(FILENAME, timestamps.now())
+            archive_load, archive_reload, archive_start = measure()
+            archive_size = size_of(FILENAME, archive.archive_path(FILENAME))
+            print(f"{size:>10} {json_load:>13.1f} {json_reload:>7.1f} {json_start:>9.2f} {json_size:>6.1f} {archive_load:>16.1f} {archive_reload:>7.1f} {archive_start:>9.2f} {archive_size:>6.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000])
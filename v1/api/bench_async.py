@@ -0,0 +1,96 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import storage_utils
+
+# 1k concurrent clients against the threaded HTTPServer and the asyncio mode,
+# each server in its own process. Every client sends GET /parking-lots/1 in a
+# loop, reusing its connection when the server keeps it open. A second round
+# adds idle connections that never send a request, like gate terminals
+# waiting between cars.
+# Usage: python bench_async.py [clients] [idle connections] [seconds]
+
+PORT = 8765
+HERE = os.path.dirname(os.path.abspath(__file__))
+REQUEST = b"GET /parking-lots/1 HTTP/1.1\r\nHost: localhost\r\n\r\n"
+
+
+async def fetch(connection):
+    if connection[0] is None:
+        connection[:] = await asyncio.open_connection('localhost', PORT)
+    reader, writer = connection
+    writer.write(REQUEST)
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = next(int(line.split(b":")[1]) for line in head.split(b"\r\n") if line.lower().startswith(b"content-length"))
+    await reader.readexactly(length)
+    if not head.startswith(b"HTTP/1.1") or b"connection: close" in head.lower():
+        writer.close()
+        connection[:] = [None, None]
+
+
+async def client(deadline, latencies, errors):
+    connection = [None, None]
+    while time.perf_counter() < deadline:
+        begin = time.perf_counter()
+        try:
+            await asyncio.wait_for(fetch(connection), deadline - begin)
+            latencies.append(time.perf_counter() - begin)
+        except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError):
+            if connection[1] is not None:
+                connection[1].close()
+            connection[:] = [None, None]
+            if time.perf_counter() < deadline:
+                errors.append(1)
+    if connection[1] is not None:
+        connection[1].close()
+
+
+async def load(clients, idle, duration):
+    idlers = []
+    for _ in range(idle):
+        try:
+            idlers.append((await asyncio.wait_for(asyncio.open_connection('localhost', PORT), 2))[1])
+        except (asyncio.TimeoutError, OSError):
+            break
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(client(deadline, latencies, errors) for _ in range(clients)))
+    for writer in idlers:
+        writer.close()
+    return latencies, len(errors)
+
+
+def run(mode, clients, idle, duration):
+    args = [sys.executable, os.path.join(HERE, 'server.py'), '--port', str(PORT)] + (['--async'] if mode == 'async' else [])
+    server = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(1.5)
+        latencies, errors = asyncio.run(load(clients, idle, duration))
+    finally:
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    p = lambda q: latencies[int(len(latencies) * q)] * 1000 if latencies else float('nan')
+    print(f"{mode:>8} {idle:>6} {len(latencies) / duration:>9.0f} {p(0.5):>9.1f} {p(0.99):>9.1f} {errors:>7}")
+
+
+def main(clients, idle, duration):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs('data/pdata')
+        storage_utils.write_json('data/users.json', [])
+        storage_utils.write_json('data/parking-lots.json', {"1": {"name": "Lot 1", "location": "Bench", "capacity": 500, "reserved": 0, "tariff": 2.5, "daytariff": 20}})
+        storage_utils.write_json('data/pdata/p1-sessions.json', {})
+        print(f"{clients} clients, {duration}s per run")
+        print(f"{'server':>8} {'idle':>6} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for extra in (0, idle):
+            for mode in ('threaded', 'async'):
+                run(mode, clients, extra, duration)
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(args[0] if args else 1000, args[1] if len(args) > 1 else 1000, args[2] if len(args) > 2 else 5)
@@ -0,0 +1,59 @@
+import importlib
+import json
+import sys
+import time
+from datetime import datetime
+import codec
+import config
+
+# Encode/decode time of the datasets' shapes with the old json calls
+# (json.dump(default=str) / json.load) and the codec with each encoder.
+# Usage: python bench_codec.py [records...]
+
+
+def datasets(count):
+    created = datetime(2024, 1, 1, 10, 0)
+    return {
+        "users": [{"id": str(i), "username": f"user{i}", "password": "pbkdf2_sha256$200000$" + "0" * 32 + "$" + "f" * 64, "name": f"User {i}", "email": f"user{i}@example.com", "phone": "+310612345678", "role": "USER", "created_at": "2024-01-01", "birth_year": 1990, "active": True} for i in range(count)],
+        "parking lots": {str(i): {"name": f"Lot {i}", "location": "Rotterdam", "address": f"Street {i}", "capacity": 500, "reserved": 12, "tariff": 2.5, "daytariff": 20, "created_at": "2024-01-01", "coordinates": {"lat": 51.92, "lng": 4.47}} for i in range(count)},
+        "sessions": {str(i): {"licenseplate": f"XX-{i}", "started": "01-01-2024 10:00:00", "stopped": "01-01-2024 11:00:00", "user": f"user{i % 1000}", "started_ts": 1704103200, "stopped_ts": 1704106800} for i in range(count)},
+        "payments": [{"transaction": "5a4307a59bc0454876213ccd35e6fc2d", "amount": 2.5, "initiator": f"user{i % 1000}", "created_at": "01-01-2024 11:00:00", "completed": False, "hash": "e3b0c44298fc1c149afbf4c8996fb924", "t_data": {}} for i in range(count)],
+        "vehicles": {f"user{i}": {str(i): {"licenseplate": f"XX-{i}", "name": "Car", "created_at": created, "updated_at": created}} for i in range(count)},
+    }
+
+
+def timed(function, repeat=3):
+    best = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - begin
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def run(name, data):
+    text = json.dumps(data, default=str)
+    results = [timed(lambda: json.dumps(data, default=str)), timed(lambda: json.loads(text))]
+    for encoder in ("json", "auto"):
+        config.JSON_CODEC = encoder
+        importlib.reload(codec)
+        payload = codec.dumps(data)
+        assert json.loads(payload) == json.loads(text)
+        results += [timed(lambda: codec.dumps(data)), timed(lambda: codec.loads(payload))]
+    return results
+
+
+def main(counts):
+    config.JSON_CODEC = "auto"
+    importlib.reload(codec)
+    print(f"fast encoder: {codec.NAME}")
+    print(f"{'dataset':>14} {'records':>8} {'old enc ms':>11} {'old dec ms':>11} {'json enc':>9} {'json dec':>9} {'fast enc':>9} {'fast dec':>9}")
+    for count in counts:
+        for name, data in datasets(count).items():
+            timings = run(name, data)
+            print(f"{name:>14} {count:>8} " + " ".join(f"{value:>{width}.1f}" for value, width in zip(timings, (11, 11, 9, 9, 9, 9))))
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000])
@@ -0,0 +1,76 @@
+import http.client
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import repository
+import server
+import storage_utils
+from session_manager import add_session
+
+# Load test: throughput of a mix of /billing calls and session starts on
+# different lots against the worker count.
+# Usage: python bench_concurrency.py [workers...]
+
+LOTS = 20
+SESSIONS_PER_LOT = 2000
+CLIENTS = 16
+DURATION = 3
+
+
+def make_data():
+    os.makedirs('data/pdata')
+    storage_utils.write_json('data/users.json', [{"username": "bench", "password": "", "name": "Bench", "role": "ADMIN"}])
+    storage_utils.write_json('data/parking-lots.json', {str(lid): {"name": f"Lot {lid}", "location": "Bench", "capacity": 500, "reserved": 0, "tariff": 2.5, "daytariff": 20} for lid in range(1, LOTS + 1)})
+    storage_utils.write_json('data/payments.json', [])
+    for lid in range(1, LOTS + 1):
+        storage_utils.write_json(f'data/pdata/p{lid}-sessions.json', {str(i): {"licenseplate": f"XX-{i}", "started": "01-01-2024 10:00:00", "stopped": "01-01-2024 11:00:00", "user": "bench" if i % 50 == 0 else f"user{i}"} for i in range(1, SESSIONS_PER_LOT + 1)})
+
+
+def client(port, token, n, stop, counter):
+    conn = http.client.HTTPConnection('localhost', port)
+    i = 0
+    while not stop.is_set():
+        i += 1
+        if n % 4 == 0:
+            conn.request('GET', '/billing', headers={'Authorization': token})
+        else:
+            conn.request('POST', f'/parking-lots/{n % LOTS + 1}/sessions/start', body=f'{{"licenseplate": "C{n}-{i}"}}', headers={'Authorization': token})
+        conn.getresponse().read()
+        conn.close()
+        counter[n] += 1
+
+
+def run(workers):
+    httpd = server.make_server('localhost', 0, workers)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    token = str(uuid.uuid4())
+    add_session(token, {"username": "bench", "role": "ADMIN"})
+    stop = threading.Event()
+    counter = [0] * CLIENTS
+    threads = [threading.Thread(target=client, args=(httpd.server_address[1], token, n, stop, counter)) for n in range(CLIENTS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    httpd.shutdown()
+    httpd.server_close()
+    return sum(counter) / DURATION
+
+
+def main(worker_counts):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        make_data()
+        repository.preload_all()
+        print(f"{'workers':>8} {'req/s':>10}")
+        for workers in worker_counts:
+            print(f"{workers:>8} {run(workers):>10.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1, 2, 4, 8])
@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+import config
+import indexes
+import repository
+import storage_utils
+
+# Gate throughput (one start plus one stop per car) on a lot with a large
+# session history: scanning all sessions for an open one against the
+# open-session index. Uses the journal backend so disk I/O stays O(1).
+# Usage: python bench_gate.py [historical sessions] [cars]
+
+FILENAME = 'data/pdata/p1-sessions.json'
+
+
+def scan_open_session(sessions, licenseplate):
+    filtered = {key: value for key, value in sessions.items() if value.get("licenseplate") == licenseplate and not value.get('stopped')}
+    return next(iter(filtered.items()), None)
+
+
+def gate(licenseplate, find):
+    sessions = repository.load(FILENAME)
+    if find(sessions, licenseplate):
+        raise RuntimeError("session already open")
+    sid = str(len(sessions) + 1)
+    sessions[sid] = {"licenseplate": licenseplate, "started": datetime.now().strftime("%d-%m-%Y %H:%M:%S"), "stopped": None, "user": "bench"}
+    repository.save_record(FILENAME, sessions, sid)
+    indexes.session_saved('1', sid, sessions[sid])
+    sid, session = find(sessions, licenseplate)
+    session["stopped"] = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
+    repository.save_record(FILENAME, sessions, sid)
+    indexes.session_changed('1', sid, session)
+
+
+def run(find, cars):
+    begin = time.perf_counter()
+    for n in range(cars):
+        gate(f"GATE-{n}", find)
+    return cars / (time.perf_counter() - begin)
+
+
+def main(history, cars):
+    config.STORAGE_BACKEND = 'journal'
+    config.JOURNAL_COMPACT_EVERY = 10 ** 9
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs('data/pdata')
+        storage_utils.write_json('data/parking-lots.json', {"1": {"name": "Bench", "tariff": 2.5, "daytariff": 20}})
+        storage_utils.write_json(FILENAME, {str(i): {"licenseplate": f"XX-{i}", "started": "01-01-2024 10:00:00", "stopped": "01-01-2024 11:00:00", "user": f"user{i % 1000}"} for i in range(1, history + 1)})
+        repository.load(FILENAME)
+        print(f"{history} historical sessions, {cars} cars")
+        print(f"scan:  {run(scan_open_session, cars):10.1f} cars/s")
+        begin = time.perf_counter()
+        indexes.build_indexes()
+        print(f"index build: {(time.perf_counter() - begin) * 1000:.1f} ms (once, at startup)")
+        print(f"index: {run(lambda sessions, licenseplate: indexes.find_open_session('1', licenseplate), cars):10.1f} cars/s")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(args[0] if args else 1000000, args[1] if len(args) > 1 else 20)
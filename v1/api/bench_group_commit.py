@@ -0,0 +1,85 @@
+import http.client
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import config
+import repository
+import server
+import storage_utils
+from session_manager import add_session
+
+# Burst of session starts at one lot: throughput and physical writes of the
+# session file with and without group commit, at a given lot size.
+# Usage: python bench_group_commit.py [sessions...]
+
+CLIENTS = 16
+DURATION = 3
+FILENAME = 'data/pdata/p1-sessions.json'
+
+
+def make_data(size):
+    os.makedirs('data/pdata', exist_ok=True)
+    storage_utils.write_json('data/users.json', [{"username": "bench", "password": "", "name": "Bench", "role": "ADMIN"}])
+    storage_utils.write_json('data/parking-lots.json', {"1": {"name": "Lot 1", "location": "Bench", "capacity": 500, "reserved": 0, "tariff": 2.5, "daytariff": 20}})
+    storage_utils.write_json(FILENAME, {str(i): {"licenseplate": f"XX-{i}", "started": "01-01-2024 10:00:00", "stopped": "01-01-2024 11:00:00", "user": f"user{i % 1000}"} for i in range(1, size + 1)})
+
+
+def client(port, token, n, stop, counter):
+    conn = http.client.HTTPConnection('localhost', port)
+    i = 0
+    while not stop.is_set():
+        i += 1
+        conn.request('POST', '/parking-lots/1/sessions/start', body=f'{{"licenseplate": "C{n}-{i}"}}', headers={'Authorization': token})
+        conn.getresponse().read()
+        counter[n] += 1
+    conn.close()
+
+
+def run(size, group_commit):
+    config.GROUP_COMMIT = group_commit
+    make_data(size)
+    repository.datasets.clear()
+    repository.preload_all()
+    writes = [0]
+    replace = storage_utils.replace
+
+    def counting_replace(temp, filename):
+        writes[0] += filename == FILENAME
+        replace(temp, filename)
+
+    storage_utils.replace = counting_replace
+    httpd = server.make_server('localhost', 0, CLIENTS)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    token = str(uuid.uuid4())
+    add_session(token, {"username": "bench", "role": "ADMIN"})
+    stop = threading.Event()
+    counter = [0] * CLIENTS
+    threads = [threading.Thread(target=client, args=(httpd.server_address[1], token, n, stop, counter)) for n in range(CLIENTS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    httpd.shutdown()
+    httpd.server_close()
+    storage_utils.replace = replace
+    assert len(storage_utils.load_json(FILENAME)) == size + sum(counter)
+    return sum(counter) / DURATION, writes[0] / DURATION
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        print(f"{'sessions':>10} {'off req/s':>10} {'writes/s':>9} {'on req/s':>10} {'writes/s':>9}")
+        for size in sizes:
+            off, off_writes = run(size, False)
+            on, on_writes = run(size, True)
+            print(f"{size:>10} {off:>10.1f} {off_writes:>9.1f} {on:>10.1f} {on_writes:>9.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
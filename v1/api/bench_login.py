@@ -0,0 +1,61 @@
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import passwords
+import repository
+import storage_utils
+
+# Login cost against the number of registered users: the old path (parse
+# users.json and scan it on every login, MD5) against the username index with
+# PBKDF2, cold (first login after start: load and index the users) and warm
+# (PBKDF2 per login, and a repeated login answered from the credential cache).
+# Usage: python bench_login.py [users] [logins]
+
+
+def legacy_login(username, password):
+    hashed_password = hashlib.md5(password.encode()).hexdigest()
+    for user in storage_utils.load_json('data/users.json'):
+        if user["username"] == username:
+            return user["password"] == hashed_password
+    return False
+
+
+def login(username, password):
+    user = repository.find_user(username)
+    return user is not None and passwords.verify_password(username, password, user["password"])
+
+
+def timed(function, logins):
+    begin = time.perf_counter()
+    for username, password in logins:
+        assert function(username, password)
+    return (time.perf_counter() - begin) / len(logins) * 1000
+
+
+def main(user_count, login_count):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs('data')
+        stored = passwords.hash_password("secret")
+        storage_utils.write_json('data/users.json', [{"username": f"user{i}", "password": hashlib.md5(b"secret").hexdigest() if i % 2 else stored, "name": f"User {i}"} for i in range(user_count)])
+        # Even users have PBKDF2 hashes, odd users legacy MD5 ones.
+        step = max(user_count // login_count // 2 * 2, 2)
+        logins = [(f"user{i}", "secret") for i in range(0, user_count, step)][:login_count]
+        legacy_logins = [(f"user{i + 1}", "secret") for i in range(0, user_count, step)][:3]
+
+        legacy = timed(legacy_login, legacy_logins)
+        cold = timed(login, logins[:1])
+        warm = timed(login, logins[1:])
+        cached = timed(login, logins[1:])
+        print(f"{user_count} users, PBKDF2 with {passwords.config.PASSWORD_ITERATIONS} iterations")
+        print(f"legacy scan + md5:     {legacy:10.2f} ms/login")
+        print(f"cold (load + index):   {cold:10.2f} ms/login")
+        print(f"warm (PBKDF2):         {warm:10.2f} ms/login")
+        print(f"warm (cached):         {cached:10.4f} ms/login")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(args[0] if args else 500000, args[1] if len(args) > 1 else 20)
@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+import time
+import indexes
+import repository
+import session_calculator as sc
+import storage_utils
+
+# Billing-style payment lookups over a large payments dataset: the old linear
+# scan per session against the transaction-hash index.
+# Usage: python bench_payments.py [payments] [sessions]
+
+
+def linear_check(hash):
+    total = 0
+    for payment in repository.load_payment_data():
+        if payment["transaction"] == hash:
+            total += payment["amount"]
+    return total
+
+
+def main(payment_count, session_count):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs('data')
+        storage_utils.write_json('data/payments.json', [{"transaction": sc.generate_payment_hash(str(i % (payment_count // 2)), {"licenseplate": "XX"}), "amount": 2.5, "initiator": "bench", "completed": False, "hash": ""} for i in range(payment_count)])
+        hashes = [sc.generate_payment_hash(str(i), {"licenseplate": "XX"}) for i in range(session_count)]
+        repository.load_payment_data()
+
+        begin = time.perf_counter()
+        linear = [linear_check(hash) for hash in hashes]
+        linear_time = time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        indexes.payment_totals()
+        build_time = time.perf_counter() - begin
+        begin = time.perf_counter()
+        indexed = [sc.check_payment_amount(hash) for hash in hashes]
+        indexed_time = time.perf_counter() - begin
+
+        assert linear == indexed
+        print(f"{payment_count} payments, {session_count} sessions")
+        print(f"linear scan:  {linear_time * 1000:10.1f} ms")
+        print(f"index build:  {build_time * 1000:10.1f} ms (once)")
+        print(f"index lookup: {indexed_time * 1000:10.3f} ms")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(args[0] if args else 100000, args[1] if len(args) > 1 else 200)
@@ -0,0 +1,50 @@
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+import session_calculator as sc
+
+# Month-end invoicing: pricing every session one at a time with
+# calculate_price against building columns once and pricing them with
+# calculate_prices. Checks that both give the same results.
+# Usage: python bench_pricing.py [sessions]
+
+LOTS = [{"tariff": 2.5, "daytariff": 20}, {"tariff": 1.75, "daytariff": 12}, {"tariff": 4, "daytariff": 999}, {"tariff": 3}]
+
+
+def sessions(count):
+    rng = random.Random(1)
+    base = datetime(2025, 1, 1)
+    for _ in range(count):
+        start = base + timedelta(seconds=rng.randrange(365 * 86400))
+        length = rng.choice([rng.randrange(300), rng.randrange(12 * 3600), rng.randrange(7 * 86400)])
+        yield rng.choice(LOTS), {"started": start.strftime("%d-%m-%Y %H:%M:%S"), "stopped": (start + timedelta(seconds=length)).strftime("%d-%m-%Y %H:%M:%S")}
+
+
+def main(count):
+    rows = list(sessions(count))
+
+    begin = time.perf_counter()
+    scalar = [sc.calculate_price(parkinglot, None, data) for parkinglot, data in rows]
+    scalar_time = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    columns = sc.session_columns(rows)
+    columns_time = time.perf_counter() - begin
+    begin = time.perf_counter()
+    prices, hours, days = sc.calculate_prices(*columns)
+    batch_time = time.perf_counter() - begin
+
+    if sc.np is not None:
+        prices, hours, days = prices.tolist(), hours.tolist(), days.tolist()
+    assert [price for price, _, _ in scalar] == prices
+    assert [hour for _, hour, _ in scalar] == hours
+    assert [day for _, _, day in scalar] == days
+    print(f"{count} sessions, {'numpy' if sc.np is not None else 'pure Python'} batch")
+    print(f"calculate_price:   {scalar_time * 1000:10.1f} ms")
+    print(f"session_columns:   {columns_time * 1000:10.1f} ms")
+    print(f"calculate_prices:  {batch_time * 1000:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
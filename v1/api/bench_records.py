@@ -0,0 +1,69 @@
+import resource
+import subprocess
+import sys
+import time
+import codec
+import config
+import records
+import timestamps
+
+# Memory held by a lot's sessions loaded as dicts and as compact records
+# (MOBYPARK_COMPACT_RECORDS), and the time to load them. Sessions are parsed
+# from JSON in chunks like a load does, so no strings are shared that a load
+# would not share; each measurement runs in its own process and reports the
+# growth of its peak resident size.
+# Usage: python bench_records.py [sessions...]
+
+FILENAME = 'data/pdata/p1-sessions.json'
+CHUNK = 10000
+PLATES = 50000
+USERS = 10000
+
+
+def chunk_text(first, count):
+    sessions = {}
+    for i in range(first, first + count):
+        started = 1704103200 + i * 61
+        sessions[str(i)] = {"licenseplate": f"XX-{i % PLATES:05}", "started": timestamps.to_text(started), "stopped": timestamps.to_text(started + 3600), "user": f"user{i % USERS}", "started_ts": started, "stopped_ts": started + 3600}
+    return codec.encode(sessions)
+
+
+def peak():
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS.
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def measure(size, compact):
+    config.COMPACT_RECORDS = compact
+    before = peak()
+    elapsed = 0
+    sessions = {}
+    for first in range(1, size + 1, CHUNK):
+        text = chunk_text(first, min(CHUNK, size - first + 1))
+        begin = time.perf_counter()
+        sessions.update(records.compact(FILENAME, codec.loads(text)))
+        elapsed += time.perf_counter() - begin
+    assert len(sessions) == size
+    return peak() - before, elapsed
+
+
+def run(size, compact):
+    result = subprocess.run([sys.executable, __file__, '--measure', str(size), '1' if compact else '0'], capture_output=True, text=True, check=True)
+    held, elapsed = result.stdout.split()
+    return int(held), float(elapsed)
+
+
+def main(sizes):
+    print(f"{'sessions':>10} {'dict MB':>9} {'B/session':>10} {'load s':>7} {'record MB':>10} {'B/session':>10} {'load s':>7}")
+    for size in sizes:
+        dict_held, dict_load = run(size, False)
+        record_held, record_load = run(size, True)
+        print(f"{size:>10} {dict_held / 2**20:>9.0f} {dict_held / size:>10.0f} {dict_load:>7.2f} {record_held / 2**20:>10.0f} {record_held / size:>10.0f} {record_load:>7.2f}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['--measure']:
+        print(*measure(int(sys.argv[2]), sys.argv[3] == '1'))
+    else:
+        main([int(arg) for arg in sys.argv[1:]] or [100000, 1000000, 5000000])
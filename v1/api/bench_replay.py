@@ -0,0 +1,76 @@
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import repository
+import server
+import storage_utils
+from session_manager import add_session
+
+# A gate controller replaying its queue after an outage: a start and a stop
+# per car, sent one request per event against one batch request, on a lot
+# with a given number of historical sessions (json backend, whole-file saves).
+# Usage: python bench_replay.py [cars] [sessions...]
+
+FILENAME = 'data/pdata/p1-sessions.json'
+
+
+def make_data(size):
+    os.makedirs('data/pdata', exist_ok=True)
+    storage_utils.write_json('data/users.json', [{"username": "bench", "password": "", "name": "Bench", "role": "ADMIN"}])
+    storage_utils.write_json('data/parking-lots.json', {"1": {"name": "Lot 1", "location": "Bench", "capacity": 500, "reserved": 0, "tariff": 2.5, "daytariff": 20}})
+    storage_utils.write_json(FILENAME, {str(i): {"licenseplate": f"XX-{i}", "started": "01-01-2024 10:00:00", "stopped": "01-01-2024 11:00:00", "user": f"user{i % 1000}"} for i in range(1, size + 1)})
+    repository.datasets.clear()
+    repository.preload_all()
+
+
+def queue(cars):
+    return [{"event": event, "licenseplate": f"GATE-{n}"} for n in range(cars) for event in ("start", "stop")]
+
+
+def one_by_one(conn, token, events):
+    for event in events:
+        conn.request('POST', f'/parking-lots/1/sessions/{event["event"]}', body=json.dumps({"licenseplate": event["licenseplate"]}), headers={'Authorization': token})
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 200
+
+
+def batch(conn, token, events):
+    conn.request('POST', '/parking-lots/1/sessions/events', body=json.dumps({"events": events}), headers={'Authorization': token})
+    result = json.loads(conn.getresponse().read())
+    assert result["applied"] == len(events)
+
+
+def run(size, cars, replay):
+    make_data(size)
+    httpd = server.make_server('localhost', 0, 1)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    token = str(uuid.uuid4())
+    add_session(token, {"username": "bench", "role": "ADMIN"})
+    conn = http.client.HTTPConnection('localhost', httpd.server_address[1])
+    begin = time.perf_counter()
+    replay(conn, token, queue(cars))
+    elapsed = time.perf_counter() - begin
+    conn.close()
+    httpd.shutdown()
+    httpd.server_close()
+    assert len(storage_utils.load_json(FILENAME)) == size + cars
+    return elapsed * 1000
+
+
+def main(cars, sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        print(f"{cars} cars, {cars * 2} events")
+        print(f"{'sessions':>10} {'one by one ms':>14} {'batch ms':>9}")
+        for size in sizes:
+            print(f"{size:>10} {run(size, cars, one_by_one):>14.1f} {run(size, cars, batch):>9.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 250, [int(arg) for arg in sys.argv[2:]] or [1000, 10000, 100000])
@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+import config
+import journal
+import repository
+import storage_utils
+
+# Session-start latency against session file size for the json and journal
+# backends. Usage: python bench_storage.py [sizes...]
+
+
+def start_session(filename, n):
+    sessions = repository.load(filename)
+    sid = str(len(sessions) + 1)
+    sessions[sid] = {
+        "licenseplate": f"BENCH-{n}",
+        "started": datetime.now().strftime("%d-%m-%Y %H:%M:%S"),
+        "stopped": None,
+        "user": "bench"
+    }
+    repository.save_record(filename, sessions, sid)
+
+
+def run(backend, size, starts=50):
+    config.STORAGE_BACKEND = backend
+    config.JOURNAL_COMPACT_EVERY = starts + 1
+    repository.datasets.clear()
+    filename = 'data/pdata/p1-sessions.json'
+    journal.truncate(filename)
+    storage_utils.write_json(filename, {str(i): {"licenseplate": f"XX-{i}", "started": "01-01-2024 10:00:00", "stopped": "01-01-2024 11:00:00", "user": f"user{i % 1000}"} for i in range(1, size + 1)})
+    repository.load(filename)
+    begin = time.perf_counter()
+    for n in range(starts):
+        start_session(filename, n)
+    return (time.perf_counter() - begin) / starts * 1000
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs('data/pdata')
+        print(f"{'sessions':>10} {'json ms':>10} {'journal ms':>12}")
+        for size in sizes:
+            print(f"{size:>10} {run('json', size):>10.3f} {run('journal', size):>12.3f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
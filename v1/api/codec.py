@@ -0,0 +1,74 @@
+import json
+from datetime import date
+from functools import lru_cache
+import config
+import records
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSON encoding and decoding for storage and responses. orjson is used when
+# it is installed (several times faster on large datasets) unless
+# MOBYPARK_JSON_CODEC is "json"; the json module otherwise. Both write the
+# same compact text for our data: orjson hands datetimes to default like json
+# does, and values orjson cannot encode (integers beyond 64 bits, for one)
+# fall back to json.
+#
+# default=str is the default, as for every file the API writes; responses
+# pass default=None to reject unknown types. Records keep their datetime
+# objects in memory, so their text is cached. Compact records (records.py)
+# are written as the objects they stand for with either.
+
+NAME = "orjson" if orjson is not None and config.JSON_CODEC != "json" else "json"
+SEPARATORS = (",", ":")
+
+if NAME == "orjson":
+    _OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+@lru_cache(maxsize=4096)
+def _date_text(value):
+    return str(value)
+
+
+def _text(value):
+    if isinstance(value, date):
+        return _date_text(value)
+    if isinstance(value, records.Record):
+        return value.to_dict()
+    return str(value)
+
+
+def _strict(value):
+    if isinstance(value, records.Record):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode(value, default=str):
+    # UTF-8 JSON bytes of value.
+    default = _text if default is str else _strict if default is None else default
+    if NAME == "orjson":
+        try:
+            return orjson.dumps(value, default=default, option=_OPTIONS)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(value, default=default, separators=SEPARATORS, ensure_ascii=False).encode("utf-8")
+
+
+def dumps(value, default=str):
+    return encode(value, default).decode("utf-8")
+
+
+def loads(data):
+    # data is str or bytes; raises ValueError on invalid JSON.
+    if NAME == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load(filename):
+    with open(filename, 'rb') as file:
+        return loads(file.read())
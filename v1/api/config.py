@@ -0,0 +1,85 @@
+import os
+
+# Storage backend: "json" rewrites whole files, "journal" appends mutations
+# to a log next to each file and compacts it every JOURNAL_COMPACT_EVERY records,
+# "sqlite" keeps the JSON datasets in SQLITE_PATH (see migrate_to_sqlite.py).
+STORAGE_BACKEND = os.environ.get("MOBYPARK_STORAGE", "json")
+SQLITE_PATH = os.environ.get("MOBYPARK_SQLITE_PATH", "data/mobypark.db")
+JOURNAL_COMPACT_EVERY = int(os.environ.get("MOBYPARK_JOURNAL_COMPACT_EVERY", "1000"))
+JOURNAL_FSYNC = os.environ.get("MOBYPARK_JOURNAL_FSYNC", "0") == "1"
+
+# Closed sessions stopped more than ARCHIVE_AFTER_DAYS days ago are rolled
+# out of the lots' JSON files into columnar archives at startup (see
+# archive.py); 0 leaves them in the JSON files. Not used by "sqlite".
+ARCHIVE_AFTER_DAYS = float(os.environ.get("MOBYPARK_ARCHIVE_AFTER_DAYS", "0"))
+
+# COMPACT_RECORDS loads the records of sessions, payments, reservations,
+# vehicles and parking lots as __slots__ objects with interned strings instead
+# of dicts, which takes a fraction of the memory (see records.py).
+COMPACT_RECORDS = os.environ.get("MOBYPARK_COMPACT_RECORDS", "0") == "1"
+
+# JSON codec for files and responses: "auto" uses orjson when it is
+# installed, "json" always uses the json module (see codec.py).
+JSON_CODEC = os.environ.get("MOBYPARK_JSON_CODEC", "auto")
+
+# Whole-file writes go through a temporary file that is fsynced (WRITE_FSYNC)
+# and renamed over the dataset. With GROUP_COMMIT the saves of concurrent
+# requests to one dataset are coalesced into one write; a request is answered
+# once its write is on disk. It is not used with FILE_LOCKS.
+WRITE_FSYNC = os.environ.get("MOBYPARK_WRITE_FSYNC", "1") == "1"
+GROUP_COMMIT = os.environ.get("MOBYPARK_GROUP_COMMIT", "1") == "1"
+
+# HTTP server. WORKERS is the size of the request thread pool, 1 serves
+# requests one at a time.
+HOST = os.environ.get("MOBYPARK_HOST", "localhost")
+PORT = int(os.environ.get("MOBYPARK_PORT", "8000"))
+WORKERS = int(os.environ.get("MOBYPARK_WORKERS", "8"))
+
+# A batch of gate events (POST /parking-lots/{lid}/sessions/events) holds at
+# most BATCH_MAX_EVENTS events.
+BATCH_MAX_EVENTS = int(os.environ.get("MOBYPARK_BATCH_MAX_EVENTS", "10000"))
+
+# Login tokens expire SESSION_TTL seconds after their last use; at most
+# SESSION_MAX_TOKENS are kept (least recently used first out) and expired ones
+# are swept every SESSION_SWEEP_INTERVAL seconds. SESSION_SNAPSHOT is a file
+# the tokens are saved to so they survive a restart, empty to keep them in
+# memory only.
+SESSION_TTL = int(os.environ.get("MOBYPARK_SESSION_TTL", str(8 * 3600)))
+SESSION_MAX_TOKENS = int(os.environ.get("MOBYPARK_SESSION_MAX_TOKENS", "100000"))
+SESSION_SWEEP_INTERVAL = int(os.environ.get("MOBYPARK_SESSION_SWEEP_INTERVAL", "60"))
+SESSION_SNAPSHOT = os.environ.get("MOBYPARK_SESSION_SNAPSHOT", "")
+
+# Multi-process serving. PROCESSES workers are forked after the listening
+# socket is bound and share it. Several processes (forked or started
+# separately behind a load balancer) need FILE_LOCKS, which adds flock()ed
+# files in LOCK_DIR to the per-dataset locks, and the "sqlite" SESSION_STORE,
+# which keeps login tokens in SESSION_DB with a per-process cache that is
+# revalidated after SESSION_CACHE_SECONDS.
+PROCESSES = int(os.environ.get("MOBYPARK_PROCESSES", "1"))
+FILE_LOCKS = os.environ.get("MOBYPARK_FILE_LOCKS", "1" if PROCESSES > 1 else "0") == "1"
+LOCK_DIR = os.environ.get("MOBYPARK_LOCK_DIR", "data/.locks")
+SESSION_STORE = os.environ.get("MOBYPARK_SESSION_STORE", "sqlite" if PROCESSES > 1 else "memory")
+SESSION_DB = os.environ.get("MOBYPARK_SESSION_DB", "data/sessions.db")
+SESSION_CACHE_SECONDS = float(os.environ.get("MOBYPARK_SESSION_CACHE_SECONDS", "2"))
+
+# Passwords are hashed with PBKDF2-SHA256 using PASSWORD_ITERATIONS rounds on
+# PASSWORD_WORKERS threads; logins with the same password are verified from a
+# cache of up to CREDENTIAL_CACHE_SIZE users (see passwords.py).
+PASSWORD_ITERATIONS = int(os.environ.get("MOBYPARK_PASSWORD_ITERATIONS", "200000"))
+PASSWORD_WORKERS = int(os.environ.get("MOBYPARK_PASSWORD_WORKERS", "2"))
+CREDENTIAL_CACHE_SIZE = int(os.environ.get("MOBYPARK_CREDENTIAL_CACHE_SIZE", "100000"))
+
+# ASYNC serves connections from an asyncio event loop (see async_server.py);
+# idle keep-alive connections are closed after KEEPALIVE_TIMEOUT seconds.
+ASYNC = os.environ.get("MOBYPARK_ASYNC", "0") == "1"
+KEEPALIVE_TIMEOUT = float(os.environ.get("MOBYPARK_KEEPALIVE_TIMEOUT", "75"))
+
+# Responses of COMPRESS_MIN_SIZE bytes and more (and all streamed ones) are
+# gzip/deflate compressed at COMPRESS_LEVEL for clients that accept it. The
+# threaded server closes connections after every response by default, as an
+# idle keep-alive connection holds one of its WORKERS; THREAD_KEEPALIVE_TIMEOUT
+# keeps HTTP/1.1 connections open for that many idle seconds instead. Clients
+# that keep connections open are better served by ASYNC.
+COMPRESS_MIN_SIZE = int(os.environ.get("MOBYPARK_COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_LEVEL = int(os.environ.get("MOBYPARK_COMPRESS_LEVEL", "6"))
+THREAD_KEEPALIVE_TIMEOUT = float(os.environ.get("MOBYPARK_THREAD_KEEPALIVE_TIMEOUT", "0"))
@@ -0,0 +1,104 @@
+import threading
+from contextlib import contextmanager
+import archive
+import codec
+import config
+import locks
+import storage_utils
+
+# Group commit for the datasets saved by rewriting their whole file. Inside
+# deferred() (one request) a save only records the data to write; when the
+# request leaves deferred(), after releasing its dataset locks, it waits until
+# a write covering its saves is on disk. The first waiter of a dataset writes
+# its latest data for every request that saved it meanwhile, so a burst of
+# session starts at one lot costs one serialization and one fsync instead of
+# one per request. The cache already holds the new data, so the repository
+# keeps serving it; on_written tells it the file has caught up.
+#
+# Only used by a single process: with file locks another process could read
+# the dataset between the request and the write.
+
+_cond = threading.Condition()
+_generations = {}
+_pending = {}
+_written = {}
+_writing = set()
+_local = threading.local()
+
+
+def enabled(filename):
+    return config.GROUP_COMMIT and not config.FILE_LOCKS and storage_utils.whole_file(filename)
+
+
+def defer(filename, data, on_written):
+    # Returns whether the save was deferred; it is written by the caller otherwise.
+    waits = getattr(_local, 'waits', None)
+    if waits is None or not enabled(filename):
+        return False
+    with _cond:
+        generation = _generations[filename] = _generations.get(filename, 0) + 1
+        _pending[filename] = (generation, data, on_written)
+    waits[filename] = generation
+    return True
+
+
+def pending(filename):
+    with _cond:
+        return filename in _pending
+
+
+@contextmanager
+def deferred():
+    _local.waits = {}
+    try:
+        yield
+    finally:
+        waits, _local.waits = _local.waits, None
+        for filename, generation in waits.items():
+            flush(filename, generation)
+
+
+def flush(filename, generation):
+    with _cond:
+        while _written.get(filename, 0) < generation:
+            if filename in _writing:
+                _cond.wait()
+                continue
+            latest, data, on_written = _pending.pop(filename)
+            _writing.add(filename)
+            break
+        else:
+            return
+    done = False
+    try:
+        _write(filename, data, on_written)
+        done = True
+    finally:
+        with _cond:
+            _writing.discard(filename)
+            if done:
+                _written[filename] = latest
+            else:
+                # Whoever waits next retries, unless a newer save superseded it.
+                _pending.setdefault(filename, (latest, data, on_written))
+            _cond.notify_all()
+
+
+def _write(filename, data, on_written):
+    # Serialized under the read lock so no request changes the data meanwhile,
+    # synced without locks, renamed under the write lock so no request loads
+    # the dataset between the rename and on_written.
+    lock = locks.dataset_lock(filename)
+    lock.acquire_read()
+    try:
+        payload = codec.encode(archive.document(data))
+    finally:
+        lock.release_read()
+    with locks.file_locked(filename):
+        temp = storage_utils.write_temp(filename, lambda file: file.write(payload), binary=True)
+        lock.acquire_write()
+        try:
+            storage_utils.replace(temp, filename)
+            on_written()
+        finally:
+            lock.release_write()
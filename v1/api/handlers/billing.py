@@ -0,0 +1,42 @@
+from session_manager import get_session
+from handlers.common import authenticate, is_admin, access_denied
+import indexes
+import ledger
+import pagination
+import responses
+
+
+def billing_rows(username, query):
+    sessions = ((f"{pid}/{sid}", (pid, sid, session)) for pid, sid, session in indexes.user_sessions(username))
+    sessions, cursor = pagination.page(sessions, query, record=lambda value: value[2])
+    return (ledger.row(pid, sid, session) for _, (pid, sid, session) in sessions), cursor
+
+
+def _send(request, username):
+    if pagination.invalid_query(request):
+        return
+    rows, cursor = billing_rows(username, request.query)
+    responses.stream(request, 200, responses.json_array(rows, default=str), headers=pagination.cursor_headers(cursor))
+
+
+def billing(request):
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    _send(request, session_user["username"])
+
+
+def billing_for_user(request, user):
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    if not is_admin(session_user):
+        access_denied(request)
+        return
+    _send(request, user)
+
+
+def datasets(request, params):
+    # Billing reads the sessions of every lot the user has parked in.
+    username = params.get("user") or (get_session(request.headers.get('Authorization')) or {}).get("username")
+    return ['data/parking-lots.json', 'data/payments.json'] + [indexes.sessions_file(lid) for lid in indexes.user_lots.get(username, ())]
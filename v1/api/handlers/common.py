@@ -0,0 +1,31 @@
+import codec
+from session_manager import get_session
+import responses
+
+
+def read_json(request):
+    return codec.loads(request.rfile.read(int(request.headers.get("Content-Length", -1))))
+
+
+def authenticate(request):
+    token = request.headers.get('Authorization')
+    session_user = get_session(token) if token else None
+    if not session_user:
+        responses.send(request, 401, b"Unauthorized: Invalid or missing session token")
+    return session_user
+
+
+def is_admin(session_user):
+    return 'ADMIN' == session_user.get('role')
+
+
+def access_denied(request):
+    responses.send(request, 403, b"Access denied")
+
+
+def missing_field(request, data, fields):
+    for field in fields:
+        if field not in data:
+            responses.send_json(request, 401, {"error": "Require field missing", "field": field})
+            return True
+    return False
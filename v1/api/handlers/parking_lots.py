@@ -0,0 +1,111 @@
+from repository import load, save, load_parking_lot_data, save_parking_lot_data
+from handlers.common import read_json, authenticate, is_admin, access_denied
+import indexes
+import pagination
+import responses
+import timestamps
+
+
+def _authorize_admin(request):
+    session_user = authenticate(request)
+    if session_user and not is_admin(session_user):
+        access_denied(request)
+        return None
+    return session_user
+
+
+def create(request):
+    if not _authorize_admin(request):
+        return
+    data = read_json(request)
+    parking_lots = load_parking_lot_data()
+    new_lid = str(len(parking_lots) + 1)
+    # The sessions file goes first, before any request can reach the lot.
+    if not load(indexes.sessions_file(new_lid)):
+        save(indexes.sessions_file(new_lid), {})
+    parking_lots[new_lid] = data
+    save_parking_lot_data(parking_lots)
+    responses.send(request, 201, f"Parking lot saved under ID: {new_lid}")
+
+
+def update(request, lid):
+    parking_lots = load_parking_lot_data()
+    if lid not in parking_lots:
+        responses.send(request, 404, b"Parking lot not found")
+        return
+    if not _authorize_admin(request):
+        return
+    data = read_json(request)
+    parking_lots[lid] = data
+    save_parking_lot_data(parking_lots)
+    responses.send(request, 200, b"Parking lot modified")
+
+
+def delete(request, lid):
+    parking_lots = load_parking_lot_data()
+    if lid not in parking_lots:
+        responses.send(request, 404, b"Parking lot not found")
+        return
+    if not _authorize_admin(request):
+        return
+    del parking_lots[lid]
+    save_parking_lot_data(parking_lots)
+    responses.send(request, 200, b"Parking lot deleted")
+
+
+def get(request, lid):
+    parking_lots = load_parking_lot_data()
+    if lid not in parking_lots:
+        responses.send(request, 404, b"Parking lot not found")
+        return
+    responses.send_json(request, 200, parking_lots[lid])
+
+
+def list_all(request):
+    if pagination.invalid_query(request):
+        return
+    parking_lots, cursor = pagination.page(load_parking_lot_data().items(), request.query)
+    responses.stream(request, 200, responses.json_object(parking_lots), headers=pagination.cursor_headers(cursor))
+
+
+def occupancy(request, lid):
+    if lid not in load_parking_lot_data():
+        responses.send(request, 404, b"Parking lot not found")
+        return
+    responses.send_json(request, 200, indexes.occupancy(lid))
+
+
+def occupancy_all(request):
+    moment = timestamps.now()
+    responses.stream(request, 200, responses.json_object((lid, indexes.occupancy(lid, moment)) for lid in load_parking_lot_data()))
+
+
+def availability(request, lid):
+    # Free spaces over [start, end) (dates in the query, ISO or like the
+    # reservations' own) as steps from the lot's reservations; open sessions
+    # are not counted as they have no known end.
+    parking_lots = load_parking_lot_data()
+    if lid not in parking_lots:
+        responses.send(request, 404, b"Parking lot not found")
+        return
+    try:
+        start, end = (timestamps.parse(request.query[field]) for field in ("start", "end"))
+    except (KeyError, ValueError):
+        responses.send_json(request, 400, {"error": "start and end must be dates", "field": "start"})
+        return
+    if start >= end:
+        responses.send_json(request, 400, {"error": "start must be before end", "field": "end"})
+        return
+    capacity = int(parking_lots[lid].get("capacity") or 0)
+    steps = indexes.reservation_timeline(lid, start, end)
+    bounds = [moment for moment, _ in steps[1:]] + [end]
+    responses.send_json(request, 200, {
+        "capacity": capacity,
+        "free": max(capacity - max(count for _, count in steps), 0),
+        "timeline": [{"from": timestamps.to_text(moment), "to": timestamps.to_text(until), "reservations": count, "free": max(capacity - count, 0)}
+                     for (moment, count), until in zip(steps, bounds)],
+    })
+
+
+def occupancy_datasets(request, params):
+    return ['data/parking-lots.json', 'data/reservations.json'] + [indexes.sessions_file(lid) for lid in load_parking_lot_data()]
@@ -0,0 +1,106 @@
+from datetime import datetime
+from repository import load_payment_data, save_record
+from handlers.common import read_json, authenticate, is_admin, access_denied, missing_field
+import session_calculator as sc
+import indexes
+import ledger
+import timestamps
+import pagination
+import responses
+
+PAYMENTS = 'data/payments.json'
+
+
+def _append(request, payment):
+    payments = load_payment_data()
+    payments.append(payment)
+    save_record(PAYMENTS, payments, len(payments) - 1)
+    indexes.payment_saved(len(payments) - 1, payment)
+    ledger.payment_saved(payment)
+    responses.send_json(request, 201, {"status": "Success", "payment": payment})
+
+
+def create(request):
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    data = read_json(request)
+    if missing_field(request, data, ["transaction", "amount"]):
+        return
+    payment = timestamps.stamp({
+        "transaction": data.get("transaction"),
+        "amount": data.get("amount", 0),
+        "initiator": session_user["username"]
+    }, "created_at")
+    payment["completed"] = False
+    payment["hash"] = sc.generate_transaction_validation_hash()
+    _append(request, payment)
+
+
+def refund(request):
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    data = read_json(request)
+    if not is_admin(session_user):
+        access_denied(request)
+        return
+    if missing_field(request, data, ["amount"]):
+        return
+    payment = timestamps.stamp({
+        "transaction": data["transaction"] if data.get("transaction") else sc.generate_payment_hash(session_user["username"], str(datetime.now())),
+        "amount": -abs(data.get("amount", 0)),
+        "coupled_to": data.get("coupled_to"),
+        "processed_by": session_user["username"]
+    }, "created_at")
+    payment["completed"] = False
+    payment["hash"] = sc.generate_transaction_validation_hash()
+    _append(request, payment)
+
+
+def complete(request, transaction):
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    data = read_json(request)
+    found = indexes.find_payment(transaction)
+    if not found:
+        responses.send(request, 404, b"Payment not found!")
+        return
+    index, payment = found
+    previous = dict(payment)
+    if missing_field(request, data, ["t_data", "validation"]):
+        return
+    if payment["hash"] != data.get("validation"):
+        responses.send_json(request, 401, {"error": "Validation failed", "info": "The validation of the security hash could not be validated for this transaction."})
+        return
+    timestamps.stamp(payment, "completed")
+    payment["t_data"] = data.get("t_data", {})
+    save_record(PAYMENTS, load_payment_data(), index)
+    indexes.payment_saved(index, payment, previous)
+    ledger.payment_saved(payment, previous)
+    responses.send_json(request, 200, {"status": "Success", "payment": payment}, default=str)
+
+
+def _list(request, user):
+    if pagination.invalid_query(request):
+        return
+    payments, cursor = pagination.page(((i, payment) for i, payment in enumerate(load_payment_data()) if payment.get("initiator") == user), request.query)
+    responses.stream(request, 200, responses.json_array(payment for _, payment in payments), headers=pagination.cursor_headers(cursor))
+
+
+def list_all(request):
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    _list(request, session_user["username"])
+
+
+def list_for_user(request, user):
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    if not is_admin(session_user):
+        access_denied(request)
+        return
+    _list(request, user)
@@ -0,0 +1,126 @@
+from repository import load_reservation_data, load_parking_lot_data, save_parking_lot_data, save_record
+from handlers.common import read_json, authenticate, is_admin, access_denied, missing_field
+import indexes
+import timestamps
+import responses
+
+RESERVATIONS = 'data/reservations.json'
+
+
+def _find(request, rid):
+    reservations = load_reservation_data()
+    if rid not in reservations:
+        responses.send(request, 404, b"Reservation not found")
+        return None
+    return reservations
+
+
+def _assign_user(request, session_user, data):
+    if is_admin(session_user):
+        return not missing_field(request, data, ["user"])
+    data["user"] = session_user["username"]
+    return True
+
+
+def _stamp_dates(data):
+    for field in ("startdate", "enddate"):
+        data.pop(field + "_ts", None)
+    timestamps.add_epochs(data, ("startdate", "enddate"))
+
+
+def _fits(request, data, parking_lots, previous=None):
+    # Dates must form a window and the lot must have room for it over the
+    # whole window next to its other reservations.
+    if indexes.reservation_window(data) is None:
+        responses.send_json(request, 400, {"error": "Invalid reservation window", "field": "enddate"})
+        return False
+    capacity = parking_lots[data["parkinglot"]].get("capacity")
+    if capacity is not None and not indexes.reservation_fits(data, int(capacity), previous):
+        responses.send_json(request, 409, {"error": "Parking lot is fully reserved in this window", "field": "parkinglot"})
+        return False
+    return True
+
+
+def create(request):
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    data = read_json(request)
+    reservations = load_reservation_data()
+    parking_lots = load_parking_lot_data()
+    rid = str(len(reservations) + 1)
+    if missing_field(request, data, ["licenseplate", "startdate", "enddate", "parkinglot"]):
+        return
+    if data.get("parkinglot", -1) not in parking_lots:
+        responses.send_json(request, 404, {"error": "Parking lot not found", "field": "parkinglot"})
+        return
+    if not _assign_user(request, session_user, data):
+        return
+    _stamp_dates(data)
+    if not _fits(request, data, parking_lots):
+        return
+    reservations[rid] = data
+    data["id"] = rid
+    parking_lots[data["parkinglot"]]["reserved"] += 1
+    save_record(RESERVATIONS, reservations, rid)
+    save_parking_lot_data(parking_lots)
+    indexes.reservation_saved(data)
+    responses.send_json(request, 201, {"status": "Success", "reservation": data})
+
+
+def update(request, rid):
+    data = read_json(request)
+    reservations = _find(request, rid)
+    if reservations is None:
+        return
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    if missing_field(request, data, ["licenseplate", "startdate", "enddate", "parkinglot"]):
+        return
+    parking_lots = load_parking_lot_data()
+    if data["parkinglot"] not in parking_lots:
+        responses.send_json(request, 404, {"error": "Parking lot not found", "field": "parkinglot"})
+        return
+    if not _assign_user(request, session_user, data):
+        return
+    _stamp_dates(data)
+    previous = reservations[rid]
+    if not _fits(request, data, parking_lots, previous):
+        return
+    reservations[rid] = data
+    save_record(RESERVATIONS, reservations, rid)
+    indexes.reservation_saved(data, previous)
+    responses.send_json(request, 200, {"status": "Updated", "reservation": data})
+
+
+def get(request, rid):
+    reservations = _find(request, rid)
+    if reservations is None:
+        return
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    if not is_admin(session_user) and not session_user["username"] == reservations[rid].get("user"):
+        access_denied(request)
+        return
+    responses.send_json(request, 200, reservations[rid])
+
+
+def delete(request, rid):
+    reservations = _find(request, rid)
+    if reservations is None:
+        return
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    if not is_admin(session_user) and not session_user["username"] == reservations[rid].get("user"):
+        access_denied(request)
+        return
+    parking_lots = load_parking_lot_data()
+    reservation = reservations.pop(rid)
+    parking_lots[reservation["parkinglot"]]["reserved"] -= 1
+    save_record(RESERVATIONS, reservations, rid)
+    save_parking_lot_data(parking_lots)
+    indexes.reservation_deleted(reservation)
+    responses.send_json(request, 200, {"status": "Deleted"})
@@ -0,0 +1,209 @@
+from repository import load, load_parking_lot_data, save_record, save_records
+from handlers.common import read_json, authenticate, is_admin, access_denied, missing_field
+import indexes
+import ledger
+import config
+import timestamps
+import pagination
+import responses
+
+EVENTS = ("start", "stop")
+ALREADY_STARTED = 'Cannot start a session when another sessions for this licesenplate is already started.'
+NOT_STARTED = 'Cannot stop a session when there is no session for this licesenplate.'
+
+
+def _lot_exists(request, lid):
+    if lid not in load_parking_lot_data():
+        responses.send(request, 404, b"Parking lot not found")
+        return False
+    return True
+
+
+def _open(lid, sessions, licenseplate, username, seconds=None):
+    session = timestamps.stamp({"licenseplate": licenseplate}, "started", seconds)
+    session["stopped"] = None
+    session["user"] = username
+    sid = indexes.new_sid(lid)
+    sessions[sid] = session
+    return sid, session
+
+
+def start(request, lid):
+    if not _lot_exists(request, lid):
+        return
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    data = read_json(request)
+    if missing_field(request, data, ['licenseplate']):
+        return
+    if indexes.find_open_session(lid, data['licenseplate']):
+        responses.send(request, 401, ALREADY_STARTED)
+        return
+    sessions = load(indexes.sessions_file(lid))
+    sid, session = _open(lid, sessions, data['licenseplate'], session_user["username"])
+    save_record(indexes.sessions_file(lid), sessions, sid)
+    indexes.session_saved(lid, sid, session)
+    responses.send(request, 200, f"Session started for: {data['licenseplate']}")
+
+
+def stop(request, lid):
+    if not _lot_exists(request, lid):
+        return
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    data = read_json(request)
+    if missing_field(request, data, ['licenseplate']):
+        return
+    open_session = indexes.find_open_session(lid, data['licenseplate'])
+    if not open_session:
+        responses.send(request, 401, NOT_STARTED)
+        return
+    sid, session = open_session
+    timestamps.stamp(session, "stopped")
+    save_record(indexes.sessions_file(lid), load(indexes.sessions_file(lid)), sid)
+    indexes.session_changed(lid, sid, session)
+    ledger.session_closed(lid, sid, session)
+    responses.send(request, 200, f"Session stopped for: {data['licenseplate']}")
+
+
+def _event_time(event):
+    # Epoch seconds of the event's "at" (ISO or like the stored dates), now
+    # without one.
+    if event.get("at") is None:
+        return timestamps.now()
+    return timestamps.parse(event["at"])
+
+
+def _apply_event(lid, sessions, event, username):
+    # Applies one gate event like start/stop would, updating the indexes but
+    # not saving; returns the sid it changed (or None) and its result.
+    if not isinstance(event, dict) or event.get("event") not in EVENTS or not isinstance(event.get("licenseplate"), str):
+        return None, {"status": 400, "error": "Invalid event", "field": "event"}
+    try:
+        seconds = _event_time(event)
+    except (TypeError, ValueError):
+        return None, {"status": 400, "error": "at must be a date", "field": "at"}
+    open_session = indexes.find_open_session(lid, event["licenseplate"])
+    if event["event"] == "start":
+        if open_session:
+            return None, {"status": 401, "error": ALREADY_STARTED}
+        sid, session = _open(lid, sessions, event["licenseplate"], username, seconds)
+        indexes.session_saved(lid, sid, session)
+        return sid, {"status": 200, "sid": sid}
+    if not open_session:
+        return None, {"status": 401, "error": NOT_STARTED}
+    sid, session = open_session
+    started = timestamps.epoch(session, "started")
+    if started is not None and seconds < started:
+        return None, {"status": 400, "error": "A session cannot stop before it started", "field": "at"}
+    timestamps.stamp(session, "stopped", seconds)
+    indexes.session_changed(lid, sid, session)
+    ledger.session_closed(lid, sid, session)
+    return sid, {"status": 200, "sid": sid}
+
+
+def events(request, lid):
+    # A gate's queue of start/stop events, applied in order and saved once;
+    # every event gets the result its own request would have had.
+    if not _lot_exists(request, lid):
+        return
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    data = read_json(request)
+    if missing_field(request, data, ['events']):
+        return
+    if not isinstance(data['events'], list):
+        responses.send_json(request, 400, {"error": "events must be a list", "field": "events"})
+        return
+    if len(data['events']) > config.BATCH_MAX_EVENTS:
+        responses.send_json(request, 413, {"error": f"At most {config.BATCH_MAX_EVENTS} events per batch", "field": "events"})
+        return
+    sessions = load(indexes.sessions_file(lid))
+    changed, results = [], []
+    for event in data['events']:
+        sid, result = _apply_event(lid, sessions, event, session_user["username"])
+        if sid is not None:
+            changed.append(sid)
+        results.append(result)
+    if changed:
+        save_records(indexes.sessions_file(lid), sessions, list(dict.fromkeys(changed)))
+    responses.send_json(request, 200, {"status": "Success", "applied": len(changed), "results": results})
+
+
+def list_all(request, lid):
+    if not _lot_exists(request, lid):
+        return
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    if pagination.invalid_query(request):
+        return
+    sessions = load(indexes.sessions_file(lid))
+    if is_admin(session_user):
+        rsessions, cursor = pagination.page(sessions.items(), request.query)
+        responses.stream(request, 200, responses.json_object(rsessions), headers=pagination.cursor_headers(cursor))
+    else:
+        rsessions, cursor = pagination.page(((sid, session) for sid, session in sessions.items() if session['user'] == session_user['username']), request.query)
+        responses.stream(request, 200, responses.json_array(session for _, session in rsessions), headers=pagination.cursor_headers(cursor))
+
+
+def export(request, lid):
+    # All of the lot's sessions (the caller's own for users) as NDJSON, one
+    # session per line with its id.
+    if not _lot_exists(request, lid):
+        return
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    sessions = load(indexes.sessions_file(lid))
+    if is_admin(session_user):
+        items = sessions.items()
+    else:
+        items = ((sid, session) for sid, session in sessions.items() if session.get('user') == session_user['username'])
+    responses.stream(request, 200, responses.ndjson({"id": sid, **session} for sid, session in items), content_type="application/x-ndjson")
+
+
+def get(request, lid, sid):
+    if not _lot_exists(request, lid):
+        return
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    sessions = load(indexes.sessions_file(lid))
+    if sid not in sessions:
+        responses.send(request, 404, b"Session not found")
+        return
+    if not is_admin(session_user) and not session_user["username"] == sessions[sid].get("user"):
+        access_denied(request)
+        return
+    responses.send_json(request, 200, sessions[sid])
+
+
+def delete(request, lid, sid):
+    if not _lot_exists(request, lid):
+        return
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    if not is_admin(session_user):
+        access_denied(request)
+        return
+    sessions = load(indexes.sessions_file(lid))
+    if not sid.isnumeric():
+        responses.send(request, 403, b"Session ID is required, cannot delete all sessions")
+        return
+    if sid not in sessions:
+        responses.send(request, 404, b"Session not found")
+        return
+    session = sessions.pop(sid)
+    save_record(indexes.sessions_file(lid), sessions, sid)
+    indexes.session_deleted(lid, sid, session)
+    ledger.session_deleted(lid, sid, session)
+    responses.send(request, 200, b"Sessions deleted")
+
+
+def delete_all(request, lid):
+    delete(request, lid, "")
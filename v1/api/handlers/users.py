@@ -0,0 +1,113 @@
+import uuid
+from locks import locked
+from repository import find_user, find_user_position, user_saved, load_user_data, save_record
+from session_manager import add_session, remove_session, get_session
+from handlers.common import read_json, authenticate
+import passwords
+import responses
+
+USERS = 'data/users.json'
+
+
+# The users routes take the users lock themselves (see locks.py) so that
+# password hashing, which is slow on purpose, runs without holding it.
+
+def register(request):
+    data = read_json(request)
+    username = data.get("username")
+    password = data.get("password")
+    name = data.get("name")
+    if not isinstance(username, str) or not isinstance(password, str) or not username or not password:
+        responses.send(request, 400, b"Missing credentials")
+        return
+    # Checked before hashing so a taken username costs no password work, and
+    # again under the write lock as another request may have taken it since.
+    with locked([USERS]):
+        taken = find_user(username)
+    if taken:
+        responses.send(request, 200, b"Username already taken")
+        return
+    hashed_password = passwords.hash_password(password)
+    with locked([], [USERS]):
+        if find_user(username):
+            responses.send(request, 200, b"Username already taken")
+            return
+        users = load_user_data()
+        users.append({
+            'username': username,
+            'password': hashed_password,
+            'name': name
+        })
+        save_record(USERS, users, len(users) - 1)
+        user_saved(len(users) - 1, users[-1])
+    responses.send(request, 201, b"User created")
+
+
+def login(request):
+    data = read_json(request)
+    username = data.get("username")
+    password = data.get("password")
+    if not username or not password:
+        responses.send(request, 400, b"Missing credentials")
+        return
+    with locked([USERS]):
+        user = find_user(username)
+    if not user:
+        responses.send(request, 401, b"User not found")
+        return
+    stored = user.get("password")
+    if not passwords.verify_password(username, password, stored):
+        responses.send(request, 401, b"Invalid credentials")
+        return
+    if passwords.needs_rehash(stored):
+        user = _rehash(username, password, stored) or user
+    token = str(uuid.uuid4())
+    add_session(token, user)
+    responses.send_json(request, 200, {"message": "User logged in", "session_token": token})
+
+
+def _rehash(username, password, stored):
+    # Upgrades a legacy MD5 hash (or another work factor) after a login.
+    hashed_password = passwords.hash_password(password)
+    with locked([], [USERS]):
+        found = find_user_position(username)
+        if found and found[1].get("password") == stored:
+            found[1]["password"] = hashed_password
+            save_record(USERS, load_user_data(), found[0])
+            return found[1]
+    return None
+
+
+def logout(request):
+    token = request.headers.get('Authorization')
+    if token and get_session(token):
+        remove_session(token)
+        responses.send(request, 200, b"User logged out")
+        return
+    responses.send(request, 400, b"Invalid session token")
+
+
+def profile(request):
+    session_user = authenticate(request)
+    if session_user:
+        responses.send_json(request, 200, session_user)
+
+
+def update_profile(request):
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    data = read_json(request)
+    # Only the user's own record changes; the username and role stay.
+    changes = {key: value for key, value in data.items() if key not in ("username", "role", "password")}
+    if data.get("password"):
+        changes["password"] = passwords.hash_password(data["password"])
+    with locked([], [USERS]):
+        found = find_user_position(session_user["username"])
+        if not found:
+            responses.send(request, 404, b"User not found")
+            return
+        found[1].update(changes)
+        save_record(USERS, load_user_data(), found[0])
+    passwords.forget(session_user["username"])
+    responses.send(request, 200, b"User updated succesfully")
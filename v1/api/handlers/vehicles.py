@@ -0,0 +1,116 @@
+from datetime import datetime
+from repository import load_json, find_user, save_record
+from handlers.common import read_json, authenticate, is_admin, missing_field
+import pagination
+import responses
+
+VEHICLES = 'data/vehicles.json'
+
+
+def create(request):
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    data = read_json(request)
+    vehicles = load_json(VEHICLES)
+    uvehicles = vehicles.get(session_user["username"], {})
+    if missing_field(request, data, ["name", "license_plate"]):
+        return
+    vid = data["license_plate"].replace("-", "")
+    if vid in uvehicles:
+        responses.send_json(request, 401, {"error": "Vehicle already exists", "data": uvehicles.get(vid)}, default=str)
+        return
+    if not uvehicles:
+        vehicles[session_user["username"]] = {}
+    vehicles[session_user["username"]][vid] = {
+        "licenseplate": data["license_plate"],
+        "name": data["name"],
+        "created_at": datetime.now(),
+        "updated_at": datetime.now()
+    }
+    save_record(VEHICLES, vehicles, session_user["username"])
+    responses.send_json(request, 201, {"status": "Success", "vehicle": data})
+
+
+def entry(request, vid):
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    data = read_json(request)
+    uvehicles = load_json(VEHICLES).get(session_user["username"], {})
+    if missing_field(request, data, ["parkinglot"]):
+        return
+    if vid not in uvehicles:
+        responses.send_json(request, 401, {"error": "Vehicle does not exist", "data": vid})
+        return
+    responses.send_json(request, 200, {"status": "Accepted", "vehicle": uvehicles[vid]}, default=str)
+
+
+def update(request, vid):
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    data = read_json(request)
+    vehicles = load_json(VEHICLES)
+    if missing_field(request, data, ["name"]):
+        return
+    uvehicles = vehicles.setdefault(session_user["username"], {})
+    if vid not in uvehicles:
+        uvehicles[vid] = {
+            "licenseplate": data.get("license_plate"),
+            "name": data["name"],
+            "created_at": datetime.now(),
+            "updated_at": datetime.now()
+        }
+    uvehicles[vid]["name"] = data["name"]
+    uvehicles[vid]["updated_at"] = datetime.now()
+    save_record(VEHICLES, vehicles, session_user["username"])
+    responses.send_json(request, 200, {"status": "Success", "vehicle": uvehicles[vid]}, default=str)
+
+
+def delete(request, vid):
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    vehicles = load_json(VEHICLES)
+    if vid not in vehicles.get(session_user["username"], {}):
+        responses.send(request, 403, b"Vehicle not found!")
+        return
+    del vehicles[session_user["username"]][vid]
+    save_record(VEHICLES, vehicles, session_user["username"])
+    responses.send_json(request, 200, {"status": "Deleted"})
+
+
+def list_all(request, user=None):
+    session_user = authenticate(request)
+    if not session_user:
+        return
+    if user is None or not is_admin(session_user):
+        user = session_user["username"]
+    elif not find_user(user):
+        responses.send(request, 404, b"User not found")
+        return
+    if pagination.invalid_query(request):
+        return
+    uvehicles, cursor = pagination.page(load_json(VEHICLES).get(user, {}).items(), request.query)
+    responses.stream(request, 200, responses.json_object(uvehicles, default=str), headers=pagination.cursor_headers(cursor))
+
+
+def _owned(request, vid):
+    session_user = authenticate(request)
+    if not session_user:
+        return False
+    if vid not in load_json(VEHICLES).get(session_user["username"], {}):
+        responses.send(request, 404, b"Not found!")
+        return False
+    return True
+
+
+def reservations(request, vid):
+    if _owned(request, vid):
+        responses.send_json(request, 200, [])
+
+
+def history(request, vid):
+    if _owned(request, vid):
+        responses.send_json(request, 200, [])
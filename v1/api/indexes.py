@@ -0,0 +1,258 @@
+import bisect
+import config
+import repository
+import timestamps
+
+# Secondary indexes over the cached datasets. They are built on first use and
+# kept up to date by the handlers after every record they save, so lookups
+# that used to scan a whole dataset become dictionary hits.
+
+PAYMENTS = 'data/payments.json'
+RESERVATIONS = 'data/reservations.json'
+
+
+def _build_payment_positions(payments):
+    positions = {}
+    for position, payment in enumerate(payments):
+        positions.setdefault(payment["transaction"], []).append(position)
+    return positions
+
+
+def _build_payment_totals(payments):
+    totals = {}
+    for payment in payments:
+        totals[payment["transaction"]] = totals.get(payment["transaction"], 0) + payment["amount"]
+    return totals
+
+
+def payment_positions():
+    return repository.index(PAYMENTS, 'positions', _build_payment_positions)
+
+
+def payment_totals():
+    return repository.index(PAYMENTS, 'totals', _build_payment_totals)
+
+
+def find_payment(transaction):
+    payments = repository.load(PAYMENTS)
+    positions = payment_positions().get(transaction)
+    return (positions[0], payments[positions[0]]) if positions else None
+
+
+def payment_saved(position, payment, previous=None):
+    # An index that has not been built yet is built later from the saved data.
+    positions = repository.built_index(PAYMENTS, 'positions')
+    if positions is not None and previous is None:
+        positions.setdefault(payment["transaction"], []).append(position)
+    totals = repository.built_index(PAYMENTS, 'totals')
+    if totals is not None:
+        if previous is not None:
+            totals[previous["transaction"]] -= previous["amount"]
+        totals[payment["transaction"]] = totals.get(payment["transaction"], 0) + payment["amount"]
+
+
+# Sessions per user across all parking lots. Each lot keeps its own
+# username -> [session id] index inside the repository (dropped whenever the
+# lot's file is reloaded); user_lots remembers which lots have sessions for a
+# user so billing only opens those lots.
+user_lots = {}
+
+
+def sessions_file(lid):
+    return f'data/pdata/p{lid}-sessions.json'
+
+
+def _build_lot_users(lid):
+    def build(sessions):
+        users = {}
+        for sid, session in sessions.items():
+            users.setdefault(session.get("user"), []).append(sid)
+        for username in users:
+            user_lots.setdefault(username, set()).add(lid)
+        return users
+    return build
+
+
+def lot_users(lid):
+    return repository.index(sessions_file(lid), 'users', _build_lot_users(lid))
+
+
+def _build_open_sessions(sessions):
+    return {session.get("licenseplate"): sid for sid, session in sessions.items() if not session.get("stopped")}
+
+
+def open_sessions(lid):
+    return repository.index(sessions_file(lid), 'open', _build_open_sessions)
+
+
+def find_open_session(lid, licenseplate):
+    sid = open_sessions(lid).get(licenseplate)
+    return (sid, repository.load(sessions_file(lid))[sid]) if sid is not None else None
+
+
+def _build_last_sid(sessions):
+    return [max((int(sid) for sid in sessions if sid.isdigit()), default=0)]
+
+
+def new_sid(lid):
+    # One past the highest session id the lot has had since it was loaded,
+    # so a deleted session's id is not handed out again.
+    return str(repository.index(sessions_file(lid), 'last', _build_last_sid)[0] + 1)
+
+
+def build_indexes():
+    for lid in repository.load_parking_lot_data():
+        lot_users(lid)
+        open_sessions(lid)
+    reservation_windows()
+
+
+def user_sessions(username):
+    if config.PROCESSES > 1 or config.FILE_LOCKS:
+        # Another process may have added the user to a lot; reloading a lot
+        # rebuilds its users index, which updates user_lots.
+        for lid in repository.load_parking_lot_data():
+            lot_users(lid)
+    lids = user_lots.get(username, ())
+    for lid in [lid for lid in repository.load_parking_lot_data() if lid in lids]:
+        sessions = repository.load(sessions_file(lid))
+        for sid in lot_users(lid).get(username, []):
+            yield lid, sid, sessions[sid]
+
+
+def session_saved(lid, sid, session):
+    users = repository.built_index(sessions_file(lid), 'users')
+    if users is not None:
+        sids = users.setdefault(session.get("user"), [])
+        if sid not in sids:
+            sids.append(sid)
+        user_lots.setdefault(session.get("user"), set()).add(lid)
+    last = repository.built_index(sessions_file(lid), 'last')
+    if last is not None and sid.isdigit():
+        last[0] = max(last[0], int(sid))
+    session_changed(lid, sid, session)
+
+
+def session_changed(lid, sid, session):
+    opened = repository.built_index(sessions_file(lid), 'open')
+    if opened is not None:
+        if not session.get("stopped"):
+            opened[session.get("licenseplate")] = sid
+        elif opened.get(session.get("licenseplate")) == sid:
+            del opened[session.get("licenseplate")]
+
+
+def session_deleted(lid, sid, session):
+    users = repository.built_index(sessions_file(lid), 'users')
+    if users is not None and sid in users.get(session.get("user"), []):
+        users[session.get("user")].remove(sid)
+    opened = repository.built_index(sessions_file(lid), 'open')
+    if opened is not None and opened.get(session.get("licenseplate")) == sid:
+        del opened[session.get("licenseplate")]
+
+
+# Reservation windows per lot: the sorted start and end epochs of the lot's
+# reservations, so the number of reservations active at a moment is two
+# bisections (those started minus those ended) however many there are, and
+# the reservations over a time window are a merge of the two lists between
+# its bounds.
+
+def reservation_window(reservation):
+    start, end = timestamps.epoch(reservation, "startdate"), timestamps.epoch(reservation, "enddate")
+    return (start, end) if start is not None and end is not None and start < end else None
+
+
+def _build_reservation_windows(reservations):
+    windows = {}
+    # A missing reservations file loads as an empty list.
+    for reservation in reservations.values() if isinstance(reservations, dict) else ():
+        window = reservation_window(reservation)
+        if window:
+            starts, ends = windows.setdefault(reservation.get("parkinglot"), ([], []))
+            starts.append(window[0])
+            ends.append(window[1])
+    for starts, ends in windows.values():
+        starts.sort()
+        ends.sort()
+    return windows
+
+
+def reservation_windows():
+    return repository.index(RESERVATIONS, 'windows', _build_reservation_windows)
+
+
+def active_reservations(lid, moment):
+    starts, ends = reservation_windows().get(lid, ((), ()))
+    return bisect.bisect_right(starts, moment) - bisect.bisect_right(ends, moment)
+
+
+def reservation_saved(reservation, previous=None):
+    windows = repository.built_index(RESERVATIONS, 'windows')
+    if windows is None:
+        return
+    if previous is not None:
+        reservation_deleted(previous)
+    window = reservation_window(reservation)
+    if window:
+        starts, ends = windows.setdefault(reservation.get("parkinglot"), ([], []))
+        bisect.insort(starts, window[0])
+        bisect.insort(ends, window[1])
+
+
+def reservation_deleted(reservation):
+    windows = repository.built_index(RESERVATIONS, 'windows')
+    window = reservation_window(reservation)
+    if windows is None or not window or reservation.get("parkinglot") not in windows:
+        return
+    starts, ends = windows[reservation.get("parkinglot")]
+    del starts[bisect.bisect_left(starts, window[0])]
+    del ends[bisect.bisect_left(ends, window[1])]
+
+
+def reservation_timeline(lid, start, end):
+    # Reservations of the lot over [start, end) as (moment, reservations)
+    # steps, the first at start. Costs two bisections plus one step per
+    # reservation starting or ending inside the window.
+    starts, ends = reservation_windows().get(lid, ((), ()))
+    i, j = bisect.bisect_right(starts, start), bisect.bisect_right(ends, start)
+    last_start, last_end = bisect.bisect_left(starts, end, i), bisect.bisect_left(ends, end, j)
+    steps = [(start, i - j)]
+    while i < last_start or j < last_end:
+        # Ends come first at equal moments: windows are half-open.
+        if j < last_end and (i == last_start or ends[j] <= starts[i]):
+            moment, delta = ends[j], -1
+            j += 1
+        else:
+            moment, delta = starts[i], 1
+            i += 1
+        count = steps[-1][1] + delta
+        if moment == steps[-1][0]:
+            steps[-1] = (moment, count)
+        else:
+            steps.append((moment, count))
+        if len(steps) > 1 and steps[-1][1] == steps[-2][1]:
+            steps.pop()
+    return steps
+
+
+def reservation_fits(reservation, capacity, previous=None):
+    # Whether the reservation's window stays within capacity next to the
+    # lot's other reservations; previous is the version it replaces.
+    window = reservation_window(reservation)
+    reservation_windows()
+    if previous is not None:
+        reservation_deleted(previous)
+    try:
+        return max(count for _, count in reservation_timeline(reservation.get("parkinglot"), *window)) < capacity
+    finally:
+        if previous is not None:
+            reservation_saved(previous)
+
+
+def occupancy(lid, moment=None):
+    # Live occupancy of a lot from the open sessions and reservation windows.
+    capacity = int(repository.load_parking_lot_data()[lid].get("capacity") or 0)
+    moment = timestamps.now() if moment is None else moment
+    opened = len(open_sessions(lid))
+    reserved = active_reservations(lid, moment)
+    return {"capacity": capacity, "sessions": opened, "reservations": reserved, "free": max(capacity - opened - reserved, 0)}
@@ -0,0 +1,90 @@
+import os
+import codec
+import config
+import locks
+
+# Append-only log of mutations for a JSON dataset. Every line is one record:
+# {"k": key, "v": value} stores a value, {"k": key} deletes it. For list
+# datasets the key is the index and an index equal to the length appends.
+lengths = {}
+
+
+def journal_path(filename):
+    return filename[:-len('.json')] + '.journal'
+
+
+def apply(data, record):
+    key = record["k"]
+    if isinstance(data, list):
+        if "v" not in record:
+            del data[key]
+        elif key == len(data):
+            data.append(record["v"])
+        else:
+            data[key] = record["v"]
+    elif "v" in record:
+        data[key] = record["v"]
+    else:
+        data.pop(key, None)
+
+
+def replay(filename, data):
+    count = 0
+    valid = 0
+    path = journal_path(filename)
+    try:
+        with open(path, 'rb') as file:
+            for line in file:
+                try:
+                    record = codec.loads(line)
+                except ValueError:
+                    # A crash during an append leaves a partial last line.
+                    break
+                if data == [] and isinstance(record["k"], str):
+                    data = {}
+                apply(data, record)
+                count += 1
+                valid += len(line)
+        if valid < os.path.getsize(path):
+            # Cut it off, or every later append would follow it unread.
+            with locks.file_locked(filename):
+                os.truncate(path, valid)
+    except FileNotFoundError:
+        pass
+    lengths[filename] = count
+    return data
+
+
+def _ends_line(file):
+    # Whether the journal is empty or ends with a newline.
+    if not file.seek(0, os.SEEK_END):
+        return True
+    file.seek(-1, os.SEEK_END)
+    return file.read(1) == b'\n'
+
+
+def append(filename, data, keys):
+    lines = []
+    for key in keys:
+        if isinstance(data, list) and key < len(data) or not isinstance(data, list) and key in data:
+            lines.append(codec.dumps({"k": key, "v": data[key]}))
+        else:
+            lines.append(codec.dumps({"k": key}))
+    with open(journal_path(filename), 'a+b') as file:
+        if not _ends_line(file):
+            # The last record was written without its newline.
+            lines.insert(0, '')
+        file.write(('\n'.join(lines) + '\n').encode('utf-8'))
+        if config.JOURNAL_FSYNC:
+            file.flush()
+            os.fsync(file.fileno())
+    lengths[filename] = lengths.get(filename, 0) + len(keys)
+    return lengths[filename]
+
+
+def truncate(filename):
+    try:
+        os.remove(journal_path(filename))
+    except FileNotFoundError:
+        pass
+    lengths[filename] = 0
@@ -0,0 +1,115 @@
+import repository
+import session_calculator as sc
+import indexes
+
+# Materialized billing ledger. A closed session's price never changes, so its
+# billing row (amount, payment hash, payed, balance) is computed the first
+# time it is billed and kept in a per-lot 'ledger' index next to the lot's
+# other session indexes. Rows are added when a session stops, removed when it
+# is deleted, and their payed and balance are refreshed when a payment for
+# their hash is saved. Open sessions are still priced on read.
+#
+# The ledger of a lot starts over when the lot's session file is reloaded or
+# the lot's fields that go into a row change (PARKING_FIELDS; the tariffs are
+# part of the price); other changes to the lot, like its reserved counter,
+# keep it. Payed amounts are refreshed when the payments dataset is reloaded.
+
+PARKING_LOTS = 'data/parking-lots.json'
+PARKING_FIELDS = ["name", "location", "tariff", "daytariff"]
+
+
+def billing_row(parkinglot, sid, session):
+    amount, hours, days = sc.calculate_price(parkinglot, sid, session)
+    transaction = sc.generate_payment_hash(sid, session)
+    payed = sc.check_payment_amount(transaction)
+    return {
+        "session": {k: v for k, v in session.items() if k in ["licenseplate", "started", "stopped"]} | {"hours": hours, "days": days},
+        "parking": {k: v for k, v in parkinglot.items() if k in PARKING_FIELDS},
+        "amount": amount,
+        "thash": transaction,
+        "payed": payed,
+        "balance": amount - payed
+    }
+
+
+def _lot_fields(lid):
+    parkinglot = repository.load(PARKING_LOTS)[lid]
+    return [parkinglot.get(field) for field in PARKING_FIELDS]
+
+
+def _build(lid):
+    def build(sessions):
+        return {"lot": _lot_fields(lid), "totals": indexes.payment_totals(), "rows": {}, "hashes": {}}
+    return build
+
+
+def _add(ledger, parkinglot, sid, session):
+    row = billing_row(parkinglot, sid, session)
+    ledger["rows"][sid] = row
+    ledger["hashes"].setdefault(row["thash"], set()).add(sid)
+    return row
+
+
+def lot_ledger(lid):
+    filename = indexes.sessions_file(lid)
+    ledger = repository.index(filename, 'ledger', _build(lid))
+    if ledger["lot"] != _lot_fields(lid):
+        repository.drop_index(filename, 'ledger')
+        ledger = repository.index(filename, 'ledger', _build(lid))
+    totals = indexes.payment_totals()
+    if ledger["totals"] is not totals:
+        ledger["totals"] = totals
+        for transaction in list(ledger["hashes"]):
+            _refresh(ledger, transaction)
+    return ledger
+
+
+def _refresh(ledger, transaction):
+    payed = ledger["totals"].get(transaction, 0)
+    for sid in list(ledger["hashes"].get(transaction, ())):
+        row = ledger["rows"].get(sid)
+        if row is not None:
+            # Rows are replaced rather than changed so concurrent readers
+            # never see a payed amount without its balance.
+            ledger["rows"][sid] = row | {"payed": payed, "balance": row["amount"] - payed}
+
+
+def row(lid, sid, session):
+    # Only the sessions billed are priced, not the rest of the lot.
+    if session.get("stopped"):
+        ledger = lot_ledger(lid)
+        found = ledger["rows"].get(sid)
+        if found is None:
+            found = _add(ledger, repository.load(PARKING_LOTS)[lid], sid, session)
+        return found
+    return billing_row(repository.load(PARKING_LOTS)[lid], sid, session)
+
+
+def _remove(ledger, sid):
+    row = ledger["rows"].pop(sid, None)
+    if row is not None:
+        ledger["hashes"][row["thash"]].discard(sid)
+
+
+def session_closed(lid, sid, session):
+    # Replaces any row kept under the sid, which may be another session's.
+    ledger = repository.built_index(indexes.sessions_file(lid), 'ledger')
+    if ledger is not None:
+        _remove(ledger, sid)
+        _add(ledger, repository.load(PARKING_LOTS)[lid], sid, session)
+
+
+def session_deleted(lid, sid, session):
+    ledger = repository.built_index(indexes.sessions_file(lid), 'ledger')
+    if ledger is not None:
+        _remove(ledger, sid)
+
+
+def payment_saved(payment, previous=None):
+    # Called after indexes.payment_saved so the totals are already updated.
+    transactions = {payment["transaction"]} | ({previous["transaction"]} if previous else set())
+    for lid in repository.load(PARKING_LOTS):
+        ledger = repository.built_index(indexes.sessions_file(lid), 'ledger')
+        if ledger is not None and ledger["totals"] is indexes.payment_totals():
+            for transaction in transactions:
+                _refresh(ledger, transaction)
@@ -0,0 +1,123 @@
+import os
+import threading
+from contextlib import contextmanager
+import config
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Read/write locks per dataset (one per filename), so requests touching
+# different datasets or different parking lots never wait on each other.
+# With config.FILE_LOCKS each lock is also taken on a file in LOCK_DIR with
+# flock(), shared for reads and exclusive for writes, so several server
+# processes can work on the same data/ directory. Writes to a dataset take
+# its file lock exclusively too (file_locked), unless the thread already
+# holds it.
+
+
+class RWLock:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire_read(self):
+        with self._cond:
+            # Writers go first, otherwise a stream of GETs starves them.
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+_locks = {}
+_locks_guard = threading.Lock()
+_held = threading.local()
+
+
+def dataset_lock(filename):
+    with _locks_guard:
+        lock = _locks.get(filename)
+        if lock is None:
+            lock = _locks[filename] = RWLock()
+        return lock
+
+
+def file_lock(filename, exclusive):
+    # Returns the release function of an flock() on the dataset's lock file.
+    os.makedirs(config.LOCK_DIR, exist_ok=True)
+    fd = os.open(os.path.join(config.LOCK_DIR, filename.replace('/', '_') + '.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    except BaseException:
+        os.close(fd)
+        raise
+    return lambda: os.close(fd)
+
+
+def _held_files():
+    held = getattr(_held, 'files', None)
+    if held is None:
+        held = _held.files = set()
+    return held
+
+
+@contextmanager
+def file_locked(filename):
+    held = _held_files()
+    if fcntl is None or filename in held:
+        yield
+        return
+    release = file_lock(filename, True)
+    held.add(filename)
+    try:
+        yield
+    finally:
+        held.discard(filename)
+        release()
+
+
+@contextmanager
+def locked(reads=(), writes=()):
+    writes = set(writes)
+    names = set(reads) | writes
+    released = []
+    try:
+        # A fixed acquisition order keeps two requests from deadlocking.
+        for name in sorted(names):
+            lock = dataset_lock(name)
+            if name in writes:
+                lock.acquire_write()
+                released.append(lock.release_write)
+            else:
+                lock.acquire_read()
+                released.append(lock.release_read)
+            if config.FILE_LOCKS and fcntl is not None:
+                released.append(file_lock(name, name in writes))
+                _held_files().add(name)
+                released.append(lambda name=name: _held_files().discard(name))
+        yield
+    finally:
+        for release in reversed(released):
+            release()
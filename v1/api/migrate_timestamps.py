@@ -0,0 +1,51 @@
+import glob
+import re
+import sys
+from datetime import datetime
+import config
+import storage_utils
+import timestamps
+
+# One-shot migration adding the epoch "*_ts" fields to existing records:
+# started/stopped of data/pdata/p*-sessions.json, created_at/completed of
+# payments and startdate/enddate of reservations. Payments written with the
+# old "%d-%m-%Y %H:%I:%s" format end in Unix seconds; those are converted and
+# the string is rewritten in the regular format. Records that already have
+# the fields are left alone, so the migration can be rerun.
+# Usage: python migrate_timestamps.py [storage backend]
+
+LEGACY_PAYMENT_TIME = re.compile(r'\d\d-\d\d-\d{4} \d\d:\d\d:(\d{9,})$')
+
+
+def fix_payment_time(payment, field):
+    match = LEGACY_PAYMENT_TIME.match(payment.get(field) or "")
+    if match and field + "_ts" not in payment:
+        timestamps.stamp(payment, field, timestamps.to_epoch(datetime.fromtimestamp(int(match.group(1)))))
+        return True
+    return False
+
+
+def migrate_file(filename, fields, fix=None):
+    data = storage_utils.load_data(filename)
+    records = data if isinstance(data, list) else data.values()
+    changed = 0
+    for record in records:
+        fixed = [fix(record, field) for field in fields] if fix else []
+        if timestamps.add_epochs(record, fields) or any(fixed):
+            changed += 1
+    if changed:
+        storage_utils.save_data(filename, data)
+    print(f"{filename}: {changed} of {len(data)} records updated")
+
+
+def migrate():
+    for filename in sorted(glob.glob('data/pdata/p*-sessions.json')):
+        migrate_file(filename, ("started", "stopped"))
+    migrate_file('data/payments.json', ("created_at", "completed"), fix_payment_time)
+    migrate_file('data/reservations.json', ("startdate", "enddate"))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        config.STORAGE_BACKEND = sys.argv[1]
+    migrate()
@@ -0,0 +1,40 @@
+import glob
+import os
+import sys
+import archive
+import config
+import journal
+import sqlite_storage
+import storage_utils
+
+# One-shot migration of the data/*.json and data/pdata/p*-sessions.json files
+# into the SQLite database used by MOBYPARK_STORAGE=sqlite. The files are read
+# like the journal backend reads them, so the sessions archived by
+# archive_sessions.py and journaled changes not yet compacted are migrated
+# too; deletions of archived sessions are left out.
+# Usage: python migrate_to_sqlite.py [database path]
+
+
+def _stored(filename):
+    # A dataset may have only a journal or an archive, no JSON snapshot yet.
+    return any(os.path.exists(path) for path in (filename, journal.journal_path(filename), archive.archive_path(filename)))
+
+
+def migrate():
+    config.STORAGE_BACKEND = 'journal'
+    filenames = [filename for filename in sqlite_storage.TABLES if _stored(filename)]
+    lots = {path[:path.rindex('-sessions.')] for path in glob.glob('data/pdata/p*-sessions.*')}
+    filenames += sorted(filename for filename in (lot + '-sessions.json' for lot in lots) if _stored(filename))
+    for filename in filenames:
+        data = storage_utils.load_data(filename)
+        if archive.is_sessions_file(filename):
+            data = {sid: session for sid, session in data.items() if session is not None}
+        sqlite_storage.save(filename, data)
+        print(f"{filename}: {len(data)} records")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        config.SQLITE_PATH = sys.argv[1]
+    migrate()
+    print(f"Migrated into {config.SQLITE_PATH}")
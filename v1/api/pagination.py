@@ -0,0 +1,94 @@
+import itertools
+from datetime import datetime
+from urllib.parse import parse_qs
+import responses
+import timestamps
+
+# Filtering and cursor pagination for the list endpoints. Items are
+# (key, value) pairs in dataset order; the cursor is the key of the last item
+# of the previous page and comes back in the X-Next-Cursor header.
+#
+#   limit, cursor                   page size and position
+#   licenseplate, user              exact match on the record fields
+#   started_after, started_before   ISO dates/times bounding "started"
+
+
+def parse_query(query):
+    return {key: values[-1] for key, values in parse_qs(query).items()}
+
+
+class InvalidQuery(ValueError):
+    def __init__(self, field, message):
+        super().__init__(message)
+        self.field = field
+
+
+def _bound(query, field):
+    try:
+        value = datetime.fromisoformat(query[field])
+    except ValueError:
+        raise InvalidQuery(field, f"{field} must be an ISO date") from None
+    return timestamps.to_epoch(value) + value.microsecond / 10**6
+
+
+def _parse(query):
+    # The query's filters with limit and date bounds converted once.
+    filters = {field: query[field] for field in ("licenseplate", "user") if field in query}
+    for field in ("started_after", "started_before"):
+        if field in query:
+            filters[field] = _bound(query, field)
+    limit = None
+    if "limit" in query:
+        try:
+            limit = max(int(query["limit"]), 1)
+        except ValueError:
+            raise InvalidQuery("limit", "limit must be an integer") from None
+    return filters, limit
+
+
+def invalid_query(request):
+    # Answers 400 for a malformed limit or date bound; handlers call it before
+    # anything is sent, like missing_field.
+    try:
+        _parse(request.query)
+    except InvalidQuery as error:
+        responses.send_json(request, 400, {"error": str(error), "field": error.field})
+        return True
+    return False
+
+
+def matches(record, filters):
+    if "licenseplate" in filters and record.get("licenseplate") != filters["licenseplate"]:
+        return False
+    if "user" in filters and record.get("user") != filters["user"]:
+        return False
+    if "started_after" in filters or "started_before" in filters:
+        started = timestamps.epoch(record, "started")
+        if started is None:
+            return False
+        if "started_after" in filters and started < filters["started_after"]:
+            return False
+        if "started_before" in filters and started >= filters["started_before"]:
+            return False
+    return True
+
+
+def page(items, query, record=lambda value: value):
+    # Raises InvalidQuery, before the first item is read, for a query that
+    # invalid_query would have answered.
+    filters, limit = _parse(query)
+    if filters:
+        items = ((key, value) for key, value in items if matches(record(value), filters))
+    if "cursor" in query:
+        items = itertools.dropwhile(lambda item: str(item[0]) != query["cursor"], items)
+        next(items, None)
+    if limit is None:
+        return items, None
+    items = list(itertools.islice(items, limit + 1))
+    if len(items) > limit:
+        return items[:limit], str(items[limit - 1][0])
+    return items, None
+
+
+def cursor_headers(cursor):
+    return {"X-Next-Cursor": cursor} if cursor is not None else {}
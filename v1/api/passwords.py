@@ -0,0 +1,80 @@
+import hashlib
+import hmac
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import config
+
+# Password hashing. New hashes are PBKDF2-SHA256 stored as
+# "pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>" with PASSWORD_ITERATIONS
+# as the work factor. Unsalted MD5 hashes from before are still accepted and
+# needs_rehash() tells the caller to replace them (and hashes with another
+# work factor) after a successful login.
+#
+# Hashing runs on a small executor of PASSWORD_WORKERS threads, so a burst of
+# logins takes at most that many cores and request threads only wait for it.
+# Verified credentials are remembered per user as a keyed digest of the
+# password and the stored hash it matched; a repeated login with the same
+# password skips PBKDF2 until the stored hash changes.
+
+ALGORITHM = "pbkdf2_sha256"
+
+executor = ThreadPoolExecutor(max_workers=config.PASSWORD_WORKERS, thread_name_prefix="password")
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_key = os.urandom(32)
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+
+def _hash(password, iterations):
+    salt = os.urandom(16)
+    return f"{ALGORITHM}${iterations}${salt.hex()}${_pbkdf2(password, salt, iterations).hex()}"
+
+
+def _verify(password, stored):
+    if stored.startswith(ALGORITHM + "$"):
+        _, iterations, salt, expected = stored.split("$")
+        return hmac.compare_digest(_pbkdf2(password, bytes.fromhex(salt), int(iterations)).hex(), expected)
+    return hmac.compare_digest(hashlib.md5(password.encode()).hexdigest(), stored)
+
+
+def hash_password(password):
+    return executor.submit(_hash, password, config.PASSWORD_ITERATIONS).result()
+
+
+def needs_rehash(stored):
+    return not stored.startswith(f"{ALGORITHM}${config.PASSWORD_ITERATIONS}$")
+
+
+def _digest(password):
+    return hmac.new(_cache_key, password.encode(), hashlib.sha256).digest()
+
+
+def verify_password(username, password, stored):
+    if not isinstance(stored, str) or not isinstance(password, str):
+        return False
+    digest = _digest(password)
+    with _cache_lock:
+        cached = _cache.get(username)
+        if cached is not None:
+            _cache.move_to_end(username)
+    if cached is not None and cached[1] == stored and hmac.compare_digest(cached[0], digest):
+        return True
+    if not executor.submit(_verify, password, stored).result():
+        return False
+    with _cache_lock:
+        _cache[username] = (digest, stored)
+        _cache.move_to_end(username)
+        while len(_cache) > config.CREDENTIAL_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return True
+
+
+def forget(username):
+    with _cache_lock:
+        _cache.pop(username, None)
@@ -0,0 +1,168 @@
+import sys
+from collections.abc import MutableMapping
+import config
+
+# Compact in-memory records. With COMPACT_RECORDS the records of the large
+# datasets are loaded as instances of the classes below instead of dicts:
+# their known fields live in __slots__ (a pointer each, no per-record hash
+# table), fields like plates and usernames that repeat across records are
+# interned so each distinct value is held once, and anything else goes to a
+# small dict of extra fields. The order of the keys is kept as one shared
+# tuple per distinct layout.
+#
+# Records behave like the dicts they replace (record["user"], .get, in,
+# .items(), item assignment, del, dict(record)) and codec writes them as the
+# same JSON object, so the handlers and the files do not change. Records
+# created by the handlers stay dicts until the dataset is next loaded.
+
+_layouts = {}
+
+
+def _layout(keys):
+    return _layouts.setdefault(keys, keys)
+
+
+class Record(MutableMapping):
+    __slots__ = ("_keys", "_extra")
+    FIELDS = ()
+    INTERNED = ()
+
+    def __init_subclass__(cls):
+        super().__init_subclass__()
+        cls._fields = frozenset(cls.FIELDS)
+        cls._interned = frozenset(cls.INTERNED)
+        # field -> whether its strings are interned
+        cls._kinds = {field: field in cls._interned for field in cls.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        record = cls.__new__(cls)
+        kinds = cls._kinds
+        extra = None
+        for key, value in data.items():
+            interned = kinds.get(key)
+            if interned is not None:
+                if interned and value.__class__ is str:
+                    value = sys.intern(value)
+                setattr(record, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        record._keys = _layout(tuple(data))
+        record._extra = extra
+        return record
+
+    def to_dict(self):
+        fields, extra = self._fields, self._extra
+        return {key: getattr(self, key) if key in fields else extra[key] for key in self._keys}
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def get(self, key, default=None):
+        if key in self._fields:
+            return getattr(self, key, default)
+        return self._extra.get(key, default) if self._extra else default
+
+    def __setitem__(self, key, value):
+        if key in self._fields:
+            if key in self._interned and value.__class__ is str:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+        if key not in self._keys:
+            self._keys = _layout(self._keys + (key,))
+
+    def __delitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        if key in self._fields:
+            delattr(self, key)
+        else:
+            del self._extra[key]
+        self._keys = _layout(tuple(name for name in self._keys if name != key))
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def copy(self):
+        return self.from_dict(self)
+
+
+class Session(Record):
+    __slots__ = FIELDS = ("licenseplate", "started", "stopped", "user", "started_ts", "stopped_ts")
+    INTERNED = ("licenseplate", "user")
+
+
+class Payment(Record):
+    __slots__ = FIELDS = ("transaction", "amount", "initiator", "processed_by", "coupled_to", "created_at", "created_at_ts", "completed", "completed_ts", "hash", "t_data")
+    INTERNED = ("initiator", "processed_by")
+
+
+class Reservation(Record):
+    __slots__ = FIELDS = ("id", "licenseplate", "startdate", "enddate", "parkinglot", "user", "startdate_ts", "enddate_ts")
+    INTERNED = ("licenseplate", "parkinglot", "user")
+
+
+class Vehicle(Record):
+    __slots__ = FIELDS = ("licenseplate", "name", "created_at", "updated_at")
+    INTERNED = ("licenseplate", "name")
+
+
+class ParkingLot(Record):
+    __slots__ = FIELDS = ("name", "location", "address", "capacity", "reserved", "tariff", "daytariff", "created_at", "coordinates")
+    INTERNED = ("location",)
+
+
+TYPES = {
+    'data/payments.json': Payment,
+    'data/reservations.json': Reservation,
+    'data/vehicles.json': Vehicle,
+    'data/parking-lots.json': ParkingLot,
+}
+
+
+def record_type(filename):
+    if filename.startswith('data/pdata/') and filename.endswith('-sessions.json'):
+        return Session
+    return TYPES.get(filename)
+
+
+def _compact_all(make, records):
+    if isinstance(records, list):
+        return [make(record) if isinstance(record, dict) else record for record in records]
+    return {key: make(record) if isinstance(record, dict) else record for key, record in records.items()}
+
+
+def compact(filename, data):
+    # The dataset with its records as compact records, as it is without
+    # COMPACT_RECORDS or for other files.
+    kind = record_type(filename) if config.COMPACT_RECORDS else None
+    if kind is None or not isinstance(data, (list, dict)):
+        return data
+    if kind is Vehicle:
+        # Vehicles are grouped per user.
+        if not isinstance(data, dict):
+            return data
+        return {user: _compact_all(kind.from_dict, vehicles) if isinstance(vehicles, dict) else vehicles for user, vehicles in data.items()}
+    return _compact_all(kind.from_dict, data)
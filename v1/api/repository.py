@@ -0,0 +1,148 @@
+import config
+import group_commit
+import sqlite_storage
+import storage_utils
+
+# In-memory copy of every dataset, keyed by filename. Reads are served from
+# memory, writes go straight through to disk. Each entry remembers the mtime
+# of the files it was loaded from so edits made by an operator on disk are
+# picked up on the next read instead of being overwritten.
+#
+# Entries also hold the secondary indexes built over their data (see
+# indexes.py). A reload or a full save drops them so they are rebuilt from the
+# new data; save_records keeps them and the caller updates them in place.
+#
+# Inside a request, saves of whole-file datasets are handed to group_commit
+# and written after the request; the entry keeps the version of the file on
+# disk until then so the newer cached data is not reloaded over.
+datasets = {}
+
+
+def load(filename):
+    version = storage_utils.data_version(filename)
+    entry = datasets.get(filename)
+    if entry is None or entry["version"] != version:
+        entry = {"version": version, "data": storage_utils.load_data(filename), "indexes": {}}
+        datasets[filename] = entry
+    return entry["data"]
+
+
+def _write(filename, data, write):
+    if not group_commit.defer(filename, data, lambda: _written(filename, data)):
+        write()
+
+
+def _written(filename, data):
+    entry = datasets.get(filename)
+    if entry is not None and (entry["data"] is data or group_commit.pending(filename)):
+        entry["version"] = storage_utils.data_version(filename)
+
+
+def save(filename, data):
+    _write(filename, data, lambda: storage_utils.save_data(filename, data))
+    datasets[filename] = {"version": storage_utils.data_version(filename), "data": data, "indexes": {}}
+
+
+def save_records(filename, data, keys):
+    _write(filename, data, lambda: storage_utils.save_records(filename, data, keys))
+    entry = datasets.get(filename)
+    if entry is None or entry["data"] is not data:
+        entry = datasets[filename] = {"data": data, "indexes": {}}
+    entry["version"] = storage_utils.data_version(filename)
+
+
+def save_record(filename, data, key):
+    save_records(filename, data, [key])
+
+
+def index(filename, name, build):
+    data = load(filename)
+    indexes = datasets[filename]["indexes"]
+    if name not in indexes:
+        indexes[name] = build(data)
+    return indexes[name]
+
+
+def built_index(filename, name):
+    entry = datasets.get(filename)
+    return entry["indexes"].get(name) if entry else None
+
+
+def drop_index(filename, name):
+    entry = datasets.get(filename)
+    if entry:
+        entry["indexes"].pop(name, None)
+
+
+def preload(filenames):
+    for filename in filenames:
+        load(filename)
+
+
+def preload_all():
+    preload(['data/users.json', 'data/parking-lots.json', 'data/reservations.json', 'data/payments.json', 'data/vehicles.json'])
+    parking_lots = load('data/parking-lots.json')
+    if isinstance(parking_lots, dict):
+        preload([f'data/pdata/p{lid}-sessions.json' for lid in parking_lots])
+
+
+# User lookups. The sqlite backend answers find_user from its username index,
+# the file backends from an index over the cached users.
+
+def _build_usernames(users):
+    positions = {}
+    for position, user in enumerate(users):
+        positions.setdefault(user.get("username"), position)
+    return positions
+
+
+def find_user_position(username):
+    # (position, user) of the first user with that name, from an index over
+    # the cached users kept up to date by user_saved.
+    users = load_user_data()
+    position = index('data/users.json', 'usernames', _build_usernames).get(username)
+    return (position, users[position]) if position is not None else None
+
+
+def user_saved(position, user):
+    usernames = built_index('data/users.json', 'usernames')
+    if usernames is not None:
+        usernames.setdefault(user.get("username"), position)
+
+
+def find_user(username):
+    if config.STORAGE_BACKEND == 'sqlite':
+        return sqlite_storage.find_user(username)
+    found = find_user_position(username)
+    return found[1] if found else None
+
+
+def load_json(filename):
+    return load(filename)
+
+def save_data(filename, data):
+    save(filename, data)
+
+def load_user_data():
+    return load('data/users.json')
+
+def save_user_data(data):
+    save('data/users.json', data)
+
+def load_parking_lot_data():
+    return load('data/parking-lots.json')
+
+def save_parking_lot_data(data):
+    save('data/parking-lots.json', data)
+
+def load_reservation_data():
+    return load('data/reservations.json')
+
+def save_reservation_data(data):
+    save('data/reservations.json', data)
+
+def load_payment_data():
+    return load('data/payments.json')
+
+def save_payment_data(data):
+    save('data/payments.json', data)
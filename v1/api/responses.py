@@ -0,0 +1,181 @@
+import hashlib
+import zlib
+import codec
+import config
+
+# Every response goes through send or stream. Both set the framing headers
+# (Content-Length, or chunked encoding for streams) so HTTP/1.1 connections
+# can be kept open, compress bodies of COMPRESS_MIN_SIZE bytes and more when
+# the client accepts gzip or deflate, and add the ETag the dispatcher
+# computed for cacheable GET requests (see etag below).
+
+WBITS = {"gzip": 31, "deflate": 15}
+
+
+def accepted_encoding(handler):
+    # gzip or deflate if the client accepts them (q=0 refuses), else None.
+    offered = {}
+    for item in (handler.headers.get("Accept-Encoding") or "").split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+    for name in WBITS:
+        if offered.get(name, offered.get("*", 0)) > 0:
+            return name
+    return None
+
+
+def compress(data, encoding):
+    compressor = zlib.compressobj(config.COMPRESS_LEVEL, zlib.DEFLATED, WBITS[encoding])
+    return compressor.compress(data) + compressor.flush()
+
+
+def _not_modified(handler, status):
+    # Checked here rather than in the dispatcher so authentication and the
+    # other checks of the handler still run; only the body is saved.
+    tag = getattr(handler, "etag", None)
+    if tag and status == 200 and not_modified(handler, tag):
+        send_not_modified(handler, tag)
+        return True
+    return False
+
+
+def _headers(handler, status, content_type, headers):
+    handler.send_response(status)
+    handler.send_header("Content-type", content_type)
+    etag = getattr(handler, "etag", None)
+    if etag and 200 <= status < 300:
+        handler.send_header("ETag", etag)
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+
+
+def send(handler, status, body, content_type="application/json", headers=None):
+    if _not_modified(handler, status):
+        return
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    encoding = getattr(handler, "encoding", None)
+    _headers(handler, status, content_type, headers)
+    if len(body) >= config.COMPRESS_MIN_SIZE:
+        # Whatever this client accepts, a cache must not hand the body to
+        # one that accepts something else.
+        handler.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            body = compress(body, encoding)
+            handler.send_header("Content-Encoding", encoding)
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def send_json(handler, status, data, default=None, headers=None):
+    send(handler, status, codec.encode(data, default), headers=headers)
+
+
+# Streaming JSON bodies for large collections, as an array, an object or
+# NDJSON lines. Items are encoded one at a time and written in blocks of
+# FLUSH_SIZE bytes, so memory use does not grow with the size of the result
+# and the first bytes go out right away. HTTP/1.1 responses use chunked
+# transfer encoding, HTTP/1.0 responses end by closing the connection.
+
+FLUSH_SIZE = 64 * 1024
+
+
+def json_array(items, default=None):
+    yield b"["
+    separator = b""
+    for item in items:
+        yield separator + codec.encode(item, default)
+        separator = b","
+    yield b"]"
+
+
+def json_object(items, default=None):
+    yield b"{"
+    separator = b""
+    for key, value in items:
+        yield separator + codec.encode(key) + b":" + codec.encode(value, default)
+        separator = b","
+    yield b"}"
+
+
+def ndjson(items, default=None):
+    for item in items:
+        yield codec.encode(item, default) + b"\n"
+
+
+def stream(handler, status, parts, content_type="application/json", headers=None):
+    # Streamed bodies are always compressed when the client accepts it, as
+    # their size is not known up front and they are usually large.
+    if _not_modified(handler, status):
+        return
+    chunked = handler.request_version == "HTTP/1.1" and handler.protocol_version == "HTTP/1.1"
+    encoding = getattr(handler, "encoding", None)
+    compressor = zlib.compressobj(config.COMPRESS_LEVEL, zlib.DEFLATED, WBITS[encoding]) if encoding else None
+    _headers(handler, status, content_type, headers)
+    handler.send_header("Vary", "Accept-Encoding")
+    if encoding:
+        handler.send_header("Content-Encoding", encoding)
+    if chunked:
+        handler.send_header("Transfer-Encoding", "chunked")
+    else:
+        handler.close_connection = True
+    handler.end_headers()
+
+    def emit(data):
+        if not data:
+            return
+        if chunked:
+            handler.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        else:
+            handler.wfile.write(data)
+
+    def write(data):
+        emit(compressor.compress(data) if compressor else data)
+
+    buffer = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= FLUSH_SIZE:
+            write(b"".join(buffer))
+            buffer = []
+            size = 0
+    if buffer:
+        write(b"".join(buffer))
+    if compressor:
+        emit(compressor.flush())
+    if chunked:
+        handler.wfile.write(b"0\r\n\r\n")
+
+
+# Conditional GET. The ETag of a cacheable route is derived from the version
+# of every dataset it reads (file mtime/size or the SQLite version counter),
+# the request itself and the caller, so it changes whenever a write could
+# change the response. A 200 response to a matching If-None-Match is sent as
+# 304 Not Modified without a body.
+
+def etag(handler, versions):
+    key = repr((versions, handler.path, sorted(handler.query.items()), handler.headers.get("Authorization"), getattr(handler, "encoding", None)))
+    return 'W/"%s"' % hashlib.sha1(key.encode("utf-8")).hexdigest()[:24]
+
+
+def not_modified(handler, tag):
+    header = handler.headers.get("If-None-Match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == tag.removeprefix("W/") for candidate in candidates)
+
+
+def send_not_modified(handler, tag):
+    handler.send_response(304)
+    handler.send_header("ETag", tag)
+    handler.end_headers()
@@ -0,0 +1,116 @@
+# Route table: method + path template -> handler. Templates use {name} for a
+# path segment and {name:int} for a numeric one that is passed as an int.
+# Static paths are a single dict lookup; templated paths are resolved by
+# walking a tree of path segments per method, preferring a literal segment
+# over a parameter, so a request costs a handful of dict lookups however
+# many routes there are.
+
+CONVERTERS = {
+    'str': str,
+    'int': int,
+}
+
+
+class Route:
+    def __init__(self, method, template, handler, reads=(), writes=(), etag=False):
+        self.method = method
+        self.template = template
+        self.handler = handler
+        self.reads = reads
+        self.writes = writes
+        # Whether responses depend on nothing but the datasets in reads, the
+        # request and the caller, so an ETag can be derived from them.
+        self.etag = etag
+
+    def locks(self, request, params):
+        # Lock lists are filename templates formatted with the path params, or
+        # a callable returning the filenames for dynamic cases.
+        reads = self.reads(request, params) if callable(self.reads) else [name.format(**params) for name in self.reads]
+        writes = self.writes(request, params) if callable(self.writes) else [name.format(**params) for name in self.writes]
+        return reads, writes
+
+
+class Node:
+    def __init__(self):
+        self.children = {}
+        self.params = []
+        self.route = None
+
+
+class Router:
+    def __init__(self):
+        self.static = {}
+        self.trees = {}
+
+    def add(self, method, template, handler, reads=(), writes=(), etag=False):
+        route = Route(method, template, handler, reads, writes, etag)
+        if '{' not in template:
+            self.static[(method, template)] = route
+            return route
+        node = self.trees.setdefault(method, Node())
+        for segment in template.split('/')[1:]:
+            if segment.startswith('{') and segment.endswith('}'):
+                name, _, kind = segment[1:-1].partition(':')
+                param = (name, CONVERTERS[kind or 'str'])
+                child = next((child for other, child in node.params if other == param), None)
+                if child is None:
+                    child = Node()
+                    node.params.append((param, child))
+                node = child
+            else:
+                node = node.children.setdefault(segment, Node())
+        if node.route is not None:
+            raise ValueError(f"Duplicate route {method} {template}")
+        node.route = route
+        return route
+
+    def match(self, method, path):
+        route = self.static.get((method, path))
+        if route is not None:
+            return route, {}
+        node = self.trees.get(method)
+        if node is None or path[:1] != '/':
+            return None, None
+        # Common case first: follow literal segments and the only parameter
+        # of a node without backtracking; fall back to a full search.
+        segments = path.split('/')
+        params = {}
+        for segment in segments[1:]:
+            child = node.children.get(segment)
+            if child is None:
+                if len(node.params) != 1 or not segment:
+                    break
+                (name, convert), child = node.params[0]
+                if convert is int and not segment.isdigit():
+                    break
+                params[name] = convert(segment)
+            node = child
+        else:
+            if node.route is not None:
+                return node.route, params
+        params = {}
+        route = _walk(self.trees[method], segments, 1, params)
+        if route is None:
+            return None, None
+        return route, params
+
+
+def _walk(node, segments, position, params):
+    if position == len(segments):
+        return node.route
+    segment = segments[position]
+    child = node.children.get(segment)
+    if child is not None:
+        route = _walk(child, segments, position + 1, params)
+        if route is not None:
+            return route
+    if not segment:
+        return None
+    for (name, convert), child in node.params:
+        if convert is int and not segment.isdigit():
+            continue
+        route = _walk(child, segments, position + 1, params)
+        if route is not None:
+            params[name] = convert(segment)
+            return route
+    return None
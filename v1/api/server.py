@@ -1,924 +1,253 @@
-import json
-import hashlib
-import uuid
-from datetime import datetime
+import argparse
+import io
+import os
+import signal
+import socket
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from http.server import HTTPServer, BaseHTTPRequestHandler
-from storage_utils import load_json, save_data, save_user_data, load_parking_lot_data, save_parking_lot_data, save_reservation_data, load_reservation_data, load_payment_data, save_payment_data
-from session_manager import add_session, remove_session, get_session
-import session_calculator as sc
+import config
+from locks import locked
+from repository import preload_all, find_user
+from router import Router
+from handlers import users, parking_lots, sessions, reservations, vehicles, payments, billing
+import archive
+import async_server
+import group_commit
+import indexes
+import responses
+import session_manager
+import sqlite_storage
+import storage_utils
+import pagination
+
+USERS = 'data/users.json'
+PARKING_LOTS = 'data/parking-lots.json'
+RESERVATIONS = 'data/reservations.json'
+PAYMENTS = 'data/payments.json'
+VEHICLES = 'data/vehicles.json'
+SESSIONS = 'data/pdata/p{lid}-sessions.json'
+
+# Every route declares the datasets it reads and writes; the dispatcher holds
+# those locks (see locks.py) for the duration of the handler. The users
+# routes that hash passwords take the users lock inside the handler instead.
+# GET routes with etag=True answer If-None-Match with 304 (see responses.py);
+# billing is not one of them as open sessions are priced up to now.
+router = Router()
+router.add('POST', '/register', users.register)
+router.add('POST', '/login', users.login)
+router.add('GET', '/logout', users.logout)
+router.add('GET', '/profile', users.profile, reads=[USERS], etag=True)
+router.add('PUT', '/profile', users.update_profile)
+
+router.add('POST', '/parking-lots', parking_lots.create, writes=[PARKING_LOTS])
+router.add('POST', '/parking-lots/', parking_lots.create, writes=[PARKING_LOTS])
+router.add('GET', '/parking-lots', parking_lots.list_all, reads=[PARKING_LOTS], etag=True)
+router.add('GET', '/parking-lots/', parking_lots.list_all, reads=[PARKING_LOTS], etag=True)
+router.add('GET', '/parking-lots/{lid}', parking_lots.get, reads=[PARKING_LOTS], etag=True)
+router.add('GET', '/parking-lots/occupancy', parking_lots.occupancy_all, reads=parking_lots.occupancy_datasets)
+router.add('GET', '/parking-lots/{lid}/occupancy', parking_lots.occupancy, reads=[PARKING_LOTS, SESSIONS, RESERVATIONS])
+router.add('GET', '/parking-lots/{lid}/availability', parking_lots.availability, reads=[PARKING_LOTS, RESERVATIONS])
+router.add('PUT', '/parking-lots/{lid}', parking_lots.update, writes=[PARKING_LOTS])
+router.add('DELETE', '/parking-lots/{lid}', parking_lots.delete, writes=[PARKING_LOTS])
+
+router.add('POST', '/parking-lots/{lid}/sessions/start', sessions.start, reads=[PARKING_LOTS], writes=[SESSIONS])
+router.add('POST', '/parking-lots/{lid}/sessions/stop', sessions.stop, reads=[PARKING_LOTS, PAYMENTS], writes=[SESSIONS])
+router.add('POST', '/parking-lots/{lid}/sessions/events', sessions.events, reads=[PARKING_LOTS, PAYMENTS], writes=[SESSIONS])
+router.add('GET', '/parking-lots/{lid}/sessions', sessions.list_all, reads=[PARKING_LOTS, SESSIONS], etag=True)
+router.add('GET', '/parking-lots/{lid}/sessions/export', sessions.export, reads=[PARKING_LOTS, SESSIONS], etag=True)
+router.add('GET', '/parking-lots/{lid}/sessions/{sid}', sessions.get, reads=[PARKING_LOTS, SESSIONS], etag=True)
+router.add('DELETE', '/parking-lots/{lid}/sessions', sessions.delete_all, reads=[PARKING_LOTS], writes=[SESSIONS])
+router.add('DELETE', '/parking-lots/{lid}/sessions/{sid}', sessions.delete, reads=[PARKING_LOTS], writes=[SESSIONS])
+
+router.add('POST', '/reservations', reservations.create, writes=[RESERVATIONS, PARKING_LOTS])
+router.add('GET', '/reservations/{rid}', reservations.get, reads=[RESERVATIONS], etag=True)
+router.add('PUT', '/reservations/{rid}', reservations.update, reads=[PARKING_LOTS], writes=[RESERVATIONS])
+router.add('DELETE', '/reservations/{rid}', reservations.delete, writes=[RESERVATIONS, PARKING_LOTS])
+
+router.add('POST', '/vehicles', vehicles.create, writes=[VEHICLES])
+router.add('POST', '/vehicles/{vid}', vehicles.entry, reads=[VEHICLES])
+router.add('POST', '/vehicles/{vid}/entry', vehicles.entry, reads=[VEHICLES])
+router.add('PUT', '/vehicles/{vid}', vehicles.update, writes=[VEHICLES])
+router.add('DELETE', '/vehicles/{vid}', vehicles.delete, writes=[VEHICLES])
+router.add('GET', '/vehicles', vehicles.list_all, reads=[VEHICLES], etag=True)
+router.add('GET', '/vehicles/{user}', vehicles.list_all, reads=[USERS, VEHICLES], etag=True)
+router.add('GET', '/vehicles/{vid}/reservations', vehicles.reservations, reads=[VEHICLES], etag=True)
+router.add('GET', '/vehicles/{vid}/history', vehicles.history, reads=[VEHICLES], etag=True)
+
+router.add('POST', '/payments', payments.create, reads=[PARKING_LOTS], writes=[PAYMENTS])
+router.add('POST', '/payments/refund', payments.refund, reads=[PARKING_LOTS], writes=[PAYMENTS])
+router.add('PUT', '/payments/{transaction}', payments.complete, reads=[PARKING_LOTS], writes=[PAYMENTS])
+router.add('GET', '/payments', payments.list_all, reads=[PAYMENTS], etag=True)
+router.add('GET', '/payments/{user}', payments.list_for_user, reads=[PAYMENTS], etag=True)
+
+router.add('GET', '/billing', billing.billing, reads=billing.datasets)
+router.add('GET', '/billing/{user}', billing.billing_for_user, reads=billing.datasets)
+
+
+class PooledHTTPServer(HTTPServer):
+    request_queue_size = 128
+
+    def __init__(self, server_address, RequestHandlerClass, workers):
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        super().__init__(server_address, RequestHandlerClass)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
 
-class RequestHandler(BaseHTTPRequestHandler):
-    def do_POST(self):
-        if self.path == "/register":
-            data  = json.loads(self.rfile.read(int(self.headers.get("Content-Length", -1))))
-            username = data.get("username")
-            password = data.get("password")
-            name = data.get("name")
-            hashed_password = hashlib.md5(password.encode()).hexdigest()
-            users = load_json('data/users.json')
-            for user in users:
-                if username == user['username']:
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(b"Username already taken")
-                    return
-            users.add({
-                'username': username,
-                'password': hashed_password,
-                'name': name
-            })
-            save_user_data(users)
-            self.send_response(201)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(b"User created")
-
-
-        elif self.path == "/login":
-            data  = json.loads(self.rfile.read(int(self.headers.get("Content-Length", -1))))
-            username = data.get("username")
-            password = data.get("password")
-            if not username or not password:
-                self.send_response(400)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Missing credentials")
-                return
-            hashed_password = hashlib.md5(password.encode()).hexdigest()
-            users = load_json('data/users.json')
-            for user in users:
-                if user.get("username") == username and user.get("password") == hashed_password:
-                    token = str(uuid.uuid4())
-                    add_session(token, user)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"message": "User logged in", "session_token": token}).encode('utf-8'))
-                    return
-                else:
-                    self.send_response(401)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(b"Invalid credentials")
-                    return
-            self.send_response(401)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(b"User not found")
-
-
-        elif self.path.startswith("/parking-lots"):
-            token = self.headers.get('Authorization')
-            if not token or not get_session(token):
-                self.send_response(401)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                return
-            session_user = get_session(token)
-            if 'sessions' in self.path:
-                lid = self.path.split("/")[2]
-                data  = json.loads(self.rfile.read(int(self.headers.get("Content-Length", -1))))
-                sessions = load_json(f'data/pdata/p{lid}-sessions.json')
-                if self.path.endswith('start'):
-                    if 'licenseplate' not in data:
-                        self.send_response(401)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps({"error": "Require field missing", "field": 'licenseplate'}).encode("utf-8"))
-                        return
-                    filtered = {key: value for key, value in sessions.items() if value.get("licenseplate") == data['licenseplate'] and not value.get('stopped')}
-                    if len(filtered) > 0:
-                        self.send_response(401)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(b'Cannot start a session when another sessions for this licesenplate is already started.')
-                        return 
-                    session = {
-                        "licenseplate": data['licenseplate'],
-                        "started": datetime.now().strftime("%d-%m-%Y %H:%M:%S"),
-                        "stopped": None,
-                        "user": session_user["username"]
-                    }
-                    sessions[str(len(sessions) + 1)] = session
-                    save_data(f'data/pdata/p{lid}-sessions.json', sessions)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(f"Session started for: {data['licenseplate']}".encode('utf-8'))
-
-                elif self.path.endswith('stop'):
-                    if 'licenseplate' not in data:
-                        self.send_response(401)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps({"error": "Require field missing", "field": 'licenseplate'}).encode("utf-8"))
-                        return
-                    filtered = {key: value for key, value in sessions.items() if value.get("licenseplate") == data['licenseplate'] and not value.get('stopped')}
-                    if len(filtered) < 0:
-                        self.send_response(401)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(b'Cannot stop a session when there is no session for this licesenplate.')
-                        return
-                    sid = next(iter(filtered))
-                    sessions[sid]["stopped"] = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
-                    save_data(f'data/pdata/p{lid}-sessions.json', sessions)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(f"Session stopped for: {data['licenseplate']}".encode('utf-8'))
-
-            else:
-                if not 'ADMIN' == session_user.get('role'):
-                    self.send_response(403)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(b"Access denied")
-                    return
-                data  = json.loads(self.rfile.read(int(self.headers.get("Content-Length", -1))))
-                parking_lots = load_parking_lot_data()
-                new_lid = str(len(parking_lots) + 1)
-                parking_lots[new_lid] = data
-                save_parking_lot_data(parking_lots)
-                self.send_response(201)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(f"Parking lot saved under ID: {new_lid}".encode('utf-8'))
-
-
-        elif self.path == "/reservations":
-            token = self.headers.get('Authorization')
-            if not token or not get_session(token):
-                self.send_response(401)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                return
-            session_user = get_session(token)
-            data  = json.loads(self.rfile.read(int(self.headers.get("Content-Length", -1))))
-            reservations = load_reservation_data()
-            parking_lots = load_parking_lot_data()
-            rid = str(len(reservations) + 1)
-            for field in ["licenseplate", "startdate", "enddate", "parkinglot"]:
-                if not field in data:
-                    self.send_response(401)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Require field missing", "field": field}).encode("utf-8"))
-                    return
-            if data.get("parkinglot", -1) not in parking_lots:
-                self.send_response(404)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": "Parking lot not found", "field": "parkinglot"}).encode("utf-8"))
-                return
-            if 'ADMIN' == session_user.get('role'):
-                if not "user" in data:
-                    self.send_response(401)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Require field missing", "field": "user"}).encode("utf-8"))
-                    return
-            else:
-                data["user"] = session_user["username"]
-            reservations[rid] = data
-            data["id"] = rid
-            parking_lots[data["parkinglot"]]["reserved"] += 1
-            save_reservation_data(reservations)
-            save_parking_lot_data(parking_lots)
-            self.send_response(201)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps({"status": "Success", "reservation": data}).encode("utf-8"))
-            return
-        
-        elif self.path == "/vehicles":
-            token = self.headers.get('Authorization')
-            if not token or not get_session(token):
-                self.send_response(401)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                return
-            session_user = get_session(token)
-            data  = json.loads(self.rfile.read(int(self.headers.get("Content-Length", -1))))
-            vehicles = load_json("data/vehicles.json")
-            uvehicles = vehicles.get(session_user["username"], {})
-            for field in ["name", "license_plate"]:
-                if not field in data:
-                    self.send_response(401)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Require field missing", "field": field}).encode("utf-8"))
-                    return
-            lid = data["license_plate"].replace("-", "")
-            if lid in uvehicles:
-                self.send_response(401)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": "Vehicle already exists", "data": uvehicles.get(lid)}).encode("utf-8"))
-                return
-            if not uvehicles:
-                vehicles[session_user["username"]] = {}
-            vehicles[session_user["username"]][lid] = {
-                "licenseplate": data["license_plate"],
-                "name": data["name"],
-                "created_at": datetime.now(),
-                "updated_at": datetime.now()
-            }
-            save_data("data/vehicles.json", vehicles)
-            self.send_response(201)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps({"status": "Success", "vehicle": data}).encode("utf-8"))
-            return
-        
-
-        elif self.path.startswith("/vehicles/"):
-            token = self.headers.get('Authorization')
-            if not token or not get_session(token):
-                self.send_response(401)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                return
-            session_user = get_session(token)
-            data  = json.loads(self.rfile.read(int(self.headers.get("Content-Length", -1))))
-            vehicles = load_json("data/vehicles.json")
-            uvehicles = vehicles.get(session_user["username"], {})
-            for field in ["parkinglot"]:
-                if not field in data:
-                    self.send_response(401)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Require field missing", "field": field}).encode("utf-8"))
-                    return
-            lid = self.path.replace("/vehicles/", "").replace("/entry", "")
-            if lid not in uvehicles:
-                self.send_response(401)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": "Vehicle does not exist", "data": lid}).encode("utf-8"))
-                return
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps({"status": "Accepted", "vehicle": vehicles[session_user["username"]][lid]}).encode("utf-8"))
-            return
-        
-
-        elif self.path.startswith("/payments"):
-            token = self.headers.get('Authorization')
-            if not token or not get_session(token):
-                self.send_response(401)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                return
-            payments = load_payment_data()
-            session_user = get_session(token)
-            data = json.loads(self.rfile.read(int(self.headers.get("Content-Length", -1))))
-            if self.path.endswith("/refund"):
-                if not 'ADMIN' == session_user.get('role'):
-                    self.send_response(403)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(b"Access denied")
-                    return 
-                for field in ["amount"]:
-                    if not field in data:
-                        self.send_response(401)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps({"error": "Require field missing", "field": field}).encode("utf-8"))
-                        return
-                payment = {
-                    "transaction": data["transaction"] if data.get("transaction") else sc.generate_payment_hash(session_user["username"], str(datetime.now())),
-                    "amount": -abs(data.get("amount", 0)),
-                    "coupled_to": data.get("coupled_to"),
-                    "processed_by": session_user["username"],
-                    "created_at": datetime.now().strftime("%d-%m-%Y %H:%I:%s"),
-                    "completed": False,
-                    "hash": sc.generate_transaction_validation_hash()
-                }
-            else:
-                for field in ["transaction", "amount"]:
-                    if not field in data:
-                        self.send_response(401)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps({"error": "Require field missing", "field": field}).encode("utf-8"))
-                        return
-                payment = {
-                    "transaction": data.get("transaction"),
-                    "amount": data.get("amount", 0),
-                    "initiator": session_user["username"],
-                    "created_at": datetime.now().strftime("%d-%m-%Y %H:%I:%s"),
-                    "completed": False,
-                    "hash": sc.generate_transaction_validation_hash()
-                }
-            payments.append(payment)
-            save_payment_data(payments)
-            self.send_response(201)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps({"status": "Success", "payment": payment}).encode("utf-8"))
-            return
-
-    def do_PUT(self):
-        if self.path.startswith("/parking-lots/"):
-            lid = self.path.split("/")[2]
-            parking_lots = load_parking_lot_data()
-            if lid:
-                if lid in parking_lots:
-                    token = self.headers.get('Authorization')
-                    if not token or not get_session(token):
-                        self.send_response(401)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                        return
-                    session_user = get_session(token)
-                    if not 'ADMIN' == session_user.get('role'):
-                        self.send_response(403)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(b"Access denied")
-                        return
-                    data  = json.loads(self.rfile.read(int(self.headers.get("Content-Length", -1))))
-                    parking_lots[lid] = data
-                    save_parking_lot_data(parking_lots)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(b"Parking lot modified")
-                else:
-                    self.send_response(404)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(b"Parking lot not found")
-                    return
-    
-                
-        elif self.path == "/profile":
-            token = self.headers.get('Authorization')
-            if not token or not get_session(token):
-                self.send_response(401)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                return
-            session_user = get_session(token)
-            data  = json.loads(self.rfile.read(int(self.headers.get("Content-Length", -1))))
-            data["username"] = session_user["username"]
-            if data["password"]:
-                data["password"] = hashlib.md5(data["password"].encode()).hexdigest()
-            save_user_data(data)
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(b"User updated succesfully")
-
-
-        elif self.path.startswith("/reservations/"):
-            data  = json.loads(self.rfile.read(int(self.headers.get("Content-Length", -1))))
-            reservations = load_reservation_data()
-            rid = self.path.replace("/reservations/", "")
-            if rid:
-                if rid in reservations:
-                    token = self.headers.get('Authorization')
-                    if not token or not get_session(token):
-                        self.send_response(401)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                        return
-                    session_user = get_session(token)
-                    for field in ["licenseplate", "startdate", "enddate", "parkinglot"]:
-                        if not field in data:
-                            self.send_response(401)
-                            self.send_header("Content-type", "application/json")
-                            self.end_headers()
-                            self.wfile.write(json.dumps({"error": "Require field missing", "field": field}).encode("utf-8"))
-                            return
-                    if 'ADMIN' == session_user.get('role'):
-                        if not "user" in data:
-                            self.send_response(401)
-                            self.send_header("Content-type", "application/json")
-                            self.end_headers()
-                            self.wfile.write(json.dumps({"error": "Require field missing", "field": "user"}).encode("utf-8"))
-                            return
-                    else:
-                        data["user"] = session_user["username"]
-                    reservations[rid] = data
-                    save_reservation_data(reservations)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"status": "Updated", "reservation": data}).encode("utf-8"))
-                    return
-                else:
-                    self.send_response(404)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(b"Reservation not found")
-                    return
-                
-
-        elif self.path.startswith("/vehicles/"):
-            token = self.headers.get('Authorization')
-            if not token or not get_session(token):
-                self.send_response(401)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                return
-            session_user = get_session(token)
-            data  = json.loads(self.rfile.read(int(self.headers.get("Content-Length", -1))))
-            vehicles = load_json("data/vehicles.json")
-            uvehicles = vehicles.get(session_user["username"], {})
-            for field in ["name"]:
-                if not field in data:
-                    self.send_response(401)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Require field missing", "field": field}).encode("utf-8"))
-                    return
-            lid = self.path.replace("/vehicles/", "")
-            if not uvehicles:
-                vehicles[session_user["username"]] = {}
-            if lid not in uvehicles:
-                vehicles[session_user["username"]][lid] = {
-                    "licenseplate": data.get("license_plate"),
-                    "name": data["name"],
-                    "created_at": datetime.now(),
-                    "updated_at": datetime.now()
-                }
-            vehicles[session_user["username"]][lid]["name"] = data["name"]
-            vehicles[session_user["username"]][lid]["updated_at"] = datetime.now()
-            save_data("data/vehicles.json", vehicles)
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps({"status": "Success", "vehicle": vehicles[session_user["username"]][lid]}, default=str).encode("utf-8"))
-            return
-        
-        elif self.path.startswith("/payments/"):
-            token = self.headers.get('Authorization')
-            if not token or not get_session(token):
-                self.send_response(401)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                return
-            pid = self.path.replace("/payments/", "")
-            payments = load_payment_data()
-            session_user = get_session(token)
-            data  = json.loads(self.rfile.read(int(self.headers.get("Content-Length", -1))))
-            payment = next(p for p in payments if p["transaction"] == pid)
-            if payment:
-                for field in ["t_data", "validation"]:
-                    if not field in data:
-                        self.send_response(401)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps({"error": "Require field missing", "field": field}).encode("utf-8"))
-                        return
-                if payment["hash"] != data.get("validation"):
-                    self.send_response(401)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "Validation failed", "info": "The validation of the security hash could not be validated for this transaction."}).encode("utf-8"))
-                    return  
-                payment["completed"] = datetime.now().strftime("%d-%m-%Y %H:%I:%s")
-                payment["t_data"] = data.get("t_data", {})
-                save_payment_data(payments)
-                self.send_response(200)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(json.dumps({"status": "Success", "payment": payment}, default=str).encode("utf-8"))
-                return
-            else:
-                self.send_response(404)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Payment not found!")
-                return
-
-
-    def do_DELETE(self):
-        if self.path.startswith("/parking-lots/"):
-            lid = self.path.split("/")[2]
-            parking_lots = load_parking_lot_data()
-            if lid:
-                if lid in parking_lots:
-                    token = self.headers.get('Authorization')
-                    if not token or not get_session(token):
-                        self.send_response(401)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                        return
-                    session_user = get_session(token)
-                    if not 'ADMIN' == session_user.get('role'):
-                        self.send_response(403)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(b"Access denied")
-                        return
-                    if 'sessions' in self.path:
-                        sessions = load_json(f'data/pdata/p{lid}-sessions.json')
-                        sid = self.path.split("/")[-1]
-                        if sid.isnumeric():
-                            del sessions[sid]
-                            save_data(f'data/pdata/p{lid}-sessions.json', sessions)
-                            self.send_response(200)
-                            self.send_header("Content-type", "application/json")
-                            self.end_headers()
-                            self.wfile.write(b"Sessions deleted")
-                        else:
-                            self.send_response(403)
-                            self.send_header("Content-type", "application/json")
-                            self.end_headers()
-                            self.wfile.write(b"Session ID is required, cannot delete all sessions")
-                    else:
-                        del parking_lots[lid]
-                        save_parking_lot_data(parking_lots)
-                        self.send_response(200)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(b"Parking lot deleted")
-                else:
-                    self.send_response(404)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(b"Parking lot not found")
-                    return
-                
-        
-        elif self.path.startswith("/reservations/"):
-            reservations = load_reservation_data()
-            parking_lots = load_parking_lot_data()
-            rid = self.path.replace("/reservations/", "")
-            if rid:
-                if rid in reservations:
-                    token = self.headers.get('Authorization')
-                    if not token or not get_session(token):
-                        self.send_response(401)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                        return
-                    session_user = get_session(token)
-                    if "ADMIN" == session_user.get('role') or session_user["username"] == reservations[rid].get("user"):
-                        del reservations[rid]
-                    else:
-                        self.send_response(403)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(b"Access denied")
-                        return
-                    pid = reservations[rid]["parkinglot"]
-                    parking_lots[pid]["reserved"] -= 1
-                    save_reservation_data(reservations)
-                    save_parking_lot_data(parking_lots)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"status": "Deleted"}).encode("utf-8"))
-                    return
-                else:
-                    self.send_response(404)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(b"Reservation not found")
-                    return
-                
-
-        elif self.path.startswith("/vehicles/"):
-            lid = self.path.replace("/vehicles/", "")
-            if lid:
-                token = self.headers.get('Authorization')
-                if not token or not get_session(token):
-                    self.send_response(401)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                    return
-                session_user = get_session(token)
-                vehicles = load_json("data/vehicles.json")
-                uvehicles = vehicles.get(session_user["username"], {})
-                if lid not in uvehicles:
-                    self.send_response(403)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(b"Vehicle not found!")
-                    return
-                del vehicles[session_user["username"]][lid]
-                save_data("data/vehicles.json", vehicles)
-                self.send_response(200)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(json.dumps({"status": "Deleted"}).encode("utf-8"))
-                return
-
-
-    def do_GET(self):
-        if self.path == "/profile":
-            token = self.headers.get('Authorization')
-            if not token or not get_session(token):
-                self.send_response(401)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                return
-            session_user = get_session(token)
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps(session_user).encode('utf-8'))
-
-
-        elif self.path == "/logout":
-            token = self.headers.get('Authorization')
-            if token and get_session(token):
-                remove_session(token)
-                self.send_response(200)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"User logged out")
-                return
-            self.send_response(400)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(b"Invalid session token")
-
-
-        elif self.path.startswith("/parking-lots/"):
-            lid = self.path.split("/")[2]
-            parking_lots = load_parking_lot_data()
-            token = self.headers.get('Authorization')
-            if lid:
-                if lid not in parking_lots:
-                    self.send_response(404)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(b"Parking lot not found")
-                    return
-                if 'sessions' in self.path:
-                    if not token or not get_session(token):
-                        self.send_response(401)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                        return
-                    sessions = load_json(f'data/pdata/p{lid}-sessions.json')
-                    rsessions = []
-                    if self.path.endswith('/sessions'):
-                        if "ADMIN" == session_user.get('role'):
-                            rsessions = sessions
-                        else:
-                            for session in sessions:
-                                if session['user'] == session_user['username']:
-                                    rsessions.append(session)
-                        self.send_response(200)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps(rsessions).encode('utf-8'))  
-                    else:
-                        sid = self.path.split("/")[-1]
-                        if not "ADMIN" == session_user.get('role') and not session_user["username"] == sessions[sid].get("user"):
-                            self.send_response(403)
-                            self.send_header("Content-type", "application/json")
-                            self.end_headers()
-                            self.wfile.write(b"Access denied")
-                            return
-                        self.send_response(200)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(json.dumps(sessions[sid]).encode('utf-8'))
-                        return
-                else:
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(parking_lots[lid]).encode('utf-8'))
-                    return
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps(parking_lots).encode('utf-8'))
-
-
-        elif self.path.startswith("/reservations/"):
-            reservations = load_reservation_data()
-            rid = self.path.replace("/reservations/", "")
-            if rid:
-                if rid in reservations:
-                    token = self.headers.get('Authorization')
-                    if not token or not get_session(token):
-                        self.send_response(401)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                        return
-                    session_user = get_session(token)
-                    if not "ADMIN" == session_user.get('role') and not session_user["username"] == reservations[rid].get("user"):
-                        self.send_response(403)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(b"Access denied")
-                        return
-                    save_reservation_data(reservations)
-                    self.send_response(200)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(json.dumps(reservations[rid]).encode("utf-8"))
-                    return
-                else:
-                    self.send_response(404)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(b"Reservation not found")
-                    return
-                
-        
-        elif self.path == "/payments":
-            token = self.headers.get('Authorization')
-            if not token or not get_session(token):
-                self.send_response(401)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                return
-            payments = []
-            session_user = get_session(token)
-            for payment in load_payment_data():
-                if payment["username"] == session_user["username"]:
-                    payments.append(payment)
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps(payments).encode("utf-8"))
-            return
-        
-    
-        elif self.path.startswith("/payments/"):
-            token = self.headers.get('Authorization')
-            if not token or not get_session(token):
-                self.send_response(401)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                return
-            payments = []
-            session_user = get_session(token)
-            user = self.path.replace("/payments/", "")
-            if not "ADMIN" == session_user.get('role'):
-                self.send_response(403)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Access denied")
-                return
-            for payment in load_payment_data():
-                if payment["username"] == session_user["username"]:
-                    payments.append(payment)
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps(payments).encode("utf-8"))
-            return
 
-
-        elif self.path == "/billing":
-            token = self.headers.get('Authorization')
-            if not token or not get_session(token):
-                self.send_response(401)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                return
-            data = []
-            session_user = get_session(token)
-            for pid, parkinglot in load_parking_lot_data().items():
-                for sid, session in load_json(f'data/pdata/p{pid}-sessions.json').items():
-                    if session["user"] == session_user["username"]:
-                        amount, hours, days = sc.calculate_price(parkinglot, sid, session)
-                        transaction = sc.generate_payment_hash(sid, session)
-                        payed = sc.check_payment_amount(transaction)
-                        data.append({
-                            "session": {k: v for k, v in session.items() if k in ["licenseplate", "started", "stopped"]} | {"hours": hours, "days": days},
-                            "parking": {k: v for k, v in parkinglot.items() if k in ["name", "location", "tariff", "daytariff"]},
-                            "amount": amount,
-                            "thash": transaction,
-                            "payed": payed,
-                            "balance": amount - payed
-                        })
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps(data, default=str).encode("utf-8"))
-            return
-        
-
-        elif self.path.startswith("/billing/"):
-            token = self.headers.get('Authorization')
-            if not token or not get_session(token):
-                self.send_response(401)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                return
-            data = []
-            session_user = get_session(token)
-            user = self.path.replace("/billing/", "")
-            if not "ADMIN" == session_user.get('role'):
-                self.send_response(403)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Access denied")
-                return
-            for pid, parkinglot in load_parking_lot_data().items():
-                for sid, session in load_json(f'data/pdata/p{pid}-sessions.json').items():
-                    if session["user"] == user:
-                        amount, hours, days = sc.calculate_price(parkinglot, sid, session)
-                        transaction = sc.generate_payment_hash(sid, session)
-                        payed = sc.check_payment_amount(transaction)
-                        data.append({
-                            "session": {k: v for k, v in session.items() if k in ["licenseplate", "started", "stopped"]} | {"hours": hours, "days": days},
-                            "parking": {k: v for k, v in parkinglot.items() if k in ["name", "location", "tariff", "daytariff"]},
-                            "amount": amount,
-                            "thash": transaction,
-                            "payed": payed,
-                            "balance": amount - payed
-                        })
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps(data, default=str).encode("utf-8"))
+class RequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.0 (one request per connection) unless THREAD_KEEPALIVE_TIMEOUT
+    # is set; then an idle HTTP/1.1 connection holds its worker for up to that
+    # many seconds. The async server (--async) keeps connections cheaply.
+    protocol_version = "HTTP/1.1" if config.THREAD_KEEPALIVE_TIMEOUT > 0 else "HTTP/1.0"
+    timeout = config.THREAD_KEEPALIVE_TIMEOUT or None
+    etag = None
+    encoding = None
+
+    def parse_request(self):
+        if not super().parse_request():
+            return False
+        self.path, _, query = self.path.partition("?")
+        self.query = pagination.parse_query(query)
+        return True
+
+    def dispatch(self):
+        # The body is read up front so a handler that answers without reading
+        # it does not leave it in the connection for the next request.
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = 0
+        connection, self.rfile = self.rfile, io.BytesIO(self.rfile.read(length) if length > 0 else b"")
+        # Responses to requests that may write are held until their writes
+        # are on disk (see group_commit.py).
+        output = self.wfile
+        if self.command != 'GET':
+            self.wfile = io.BytesIO()
+        self.etag = None
+        self.encoding = responses.accepted_encoding(self)
+        try:
+            with group_commit.deferred():
+                self._dispatch()
+            if self.wfile is not output:
+                output.write(self.wfile.getvalue())
+        finally:
+            self.rfile, self.wfile = connection, output
+
+    def _dispatch(self):
+        route, params = router.match(self.command, self.path)
+        if route is None:
+            responses.send(self, 404, b"Not found")
             return
-        
-
-        elif self.path.startswith("/vehicles"):
-            token = self.headers.get('Authorization')
-            if not token or not get_session(token):
-                self.send_response(401)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(b"Unauthorized: Invalid or missing session token")
-                return
-            session_user = get_session(token)
-            if self.path.endswith("/reservations"):
-                vid = self.path.split("/")[2]
-                vehicles = load_json("data/vehicles.json")
-                uvehicles = vehicles.get(session_user["username"], {}) 
-                if vid not in uvehicles:
-                    self.send_response(404)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(b"Not found!")
-                    return
-                self.send_response(200)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(json.dumps([]).encode("utf-8"))
-                return
-            elif self.path.endswith("/history"):
-                vid = self.path.split("/")[2]
-                vehicles = load_json("data/vehicles.json")
-                uvehicles = vehicles.get(session_user["username"], {})
-                if vid not in uvehicles:
-                    self.send_response(404)
-                    self.send_header("Content-type", "application/json")
-                    self.end_headers()
-                    self.wfile.write(b"Not found!")
-                    return
-                self.send_response(200)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(json.dumps([]).encode("utf-8"))
-                return
-            else:
-                vehicles = load_json("data/vehicles.json")
-                users = load_json('data/users.json')
-                user = session_user["username"]
-                if "ADMIN" == session_user.get("role") and self.path != "/vehicles":
-                    user = self.path.replace("/vehicles/", "")
-                    if user not in [u["username"] for u in users]:
-                        self.send_response(404)
-                        self.send_header("Content-type", "application/json")
-                        self.end_headers()
-                        self.wfile.write(b"User not found")
-                        return
-                self.send_response(200)
-                self.send_header("Content-type", "application/json")
-                self.end_headers()
-                self.wfile.write(json.dumps(vehicles.get(user, {}), default=str).encode("utf-8"))
-                return
-            
-
-server = HTTPServer(('localhost', 8000), RequestHandler)
-print("Server running on http://localhost:8000")
-server.serve_forever()
+        reads, writes = route.locks(self, params)
+        with locked(reads, writes):
+            if route.etag:
+                self.etag = responses.etag(self, [storage_utils.data_version(name) for name in reads])
+            route.handler(self, **params)
+
+    do_GET = do_POST = do_PUT = do_DELETE = dispatch
+
+
+def make_server(host, port, workers):
+    return PooledHTTPServer((host, port), RequestHandler, workers)
+
+
+def make_async_server(host, port, workers):
+    sock = socket.create_server((host, port), backlog=PooledHTTPServer.request_queue_size * 8)
+    return sock, lambda: async_server.serve(sock, RequestHandler, workers)
+
+
+def serve_child(serve):
+    sqlite_storage.reset()
+    session_manager.store.reset()
+    session_manager.start_sweeper()
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        serve()
+    finally:
+        os._exit(0)
+
+
+def serve_processes(serve, processes):
+    # Pre-fork: the children share the listening socket and the datasets
+    # preloaded by the parent. The parent replaces children that die and
+    # stops them all when it is terminated.
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            serve_child(serve)
+        return pid
+
+    children = {spawn() for _ in range(processes)}
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        while True:
+            pid, _ = os.wait()
+            if pid in children:
+                children.discard(pid)
+                children.add(spawn())
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MobyPark API server")
+    parser.add_argument("--host", default=config.HOST)
+    parser.add_argument("--port", type=int, default=config.PORT)
+    parser.add_argument("--workers", type=int, default=config.WORKERS)
+    parser.add_argument("--processes", type=int, default=config.PROCESSES)
+    parser.add_argument("--async", dest="async_mode", action="store_true", default=config.ASYNC, help="serve connections from an asyncio event loop")
+    args = parser.parse_args()
+    if args.processes > 1:
+        # Workers only see each other's writes and tokens through file locks
+        # and the shared token store.
+        config.PROCESSES = args.processes
+        config.FILE_LOCKS = True
+        if config.SESSION_STORE != 'sqlite':
+            config.SESSION_STORE = 'sqlite'
+            session_manager.store = session_manager.make_store()
+    if config.ARCHIVE_AFTER_DAYS and config.STORAGE_BACKEND != 'sqlite':
+        rolled = sum(archive.roll_all(config.ARCHIVE_AFTER_DAYS).values())
+        print(f"Archived {rolled} closed session(s)")
+    preload_all()
+    indexes.build_indexes()
+    if config.SESSION_SNAPSHOT:
+        restored = session_manager.store.load_snapshot(config.SESSION_SNAPSHOT, lambda user: find_user(user.get("username")))
+        print(f"Restored {restored} session token(s) from {config.SESSION_SNAPSHOT}")
+    if args.async_mode:
+        _, serve = make_async_server(args.host, args.port, args.workers)
+    else:
+        serve = make_server(args.host, args.port, args.workers).serve_forever
+    print(f"Server running on http://{args.host}:{args.port} with {args.processes} process(es) of {args.workers} worker(s){' (async)' if args.async_mode else ''}", flush=True)
+    if args.processes > 1:
+        serve_processes(serve, args.processes)
+        return
+    session_manager.start_sweeper()
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        serve()
+    finally:
+        if config.SESSION_SNAPSHOT:
+            session_manager.store.save_snapshot(config.SESSION_SNAPSHOT)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,116 @@
 from datetime import datetime
-from storage_utils import load_payment_data
+import indexes
+import timestamps
 from hashlib import md5
 import math
 import uuid
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 def calculate_price(parkinglot, sid, data):
-    price = 0
-    start = datetime.strptime(data["started"], "%d-%m-%Y %H:%M:%S")
+    start = _timestamp_us(data, "started")
+    end = _timestamp_us(data, "stopped") if data.get("stopped") else _now_us()
+    return _price(start, end, parkinglot.get("tariff"), parkinglot.get("daytariff", 999))
 
-    if data.get("stopped"):
-        end = datetime.strptime(data["stopped"], "%d-%m-%Y %H:%M:%S")
-    else:
-        end = datetime.now()
 
+def _price(start, end, tariff, daytariff):
     diff = end - start
-    hours = math.ceil(diff.total_seconds() / 3600)
+    seconds = diff / 10**6
+    hours = math.ceil(seconds / 3600)
+    next_day = end // US_PER_DAY > start // US_PER_DAY
 
-    if diff.total_seconds() < 180:
+    if seconds < 180:
         price = 0
-    elif end.date() > start.date():
-        price = float(parkinglot.get("daytariff", 999)) * (diff.days + 1)
+    elif next_day:
+        price = float(daytariff) * (diff // US_PER_DAY + 1)
     else:
-        price = float(parkinglot.get("tariff")) * hours
+        price = float(tariff) * hours
+
+        if price > float(daytariff):
+            price = float(daytariff)
+
+    return (price, hours, diff // US_PER_DAY + 1 if next_day else 0)
+
+
+# Prices are computed on naive microseconds since 1970-01-01 (the epoch of
+# timestamps.py scaled to the resolution of datetime.now()), which mirrors
+# timedelta exactly: total_seconds() is the microsecond count divided by
+# 10**6 and .days is a floor division. calculate_prices does the same over
+# columns, as NumPy arrays when it is installed and per element otherwise.
+
+US_PER_DAY = 86400 * 10**6
+
 
-        if price > float(parkinglot.get("daytariff", 999)):
-            price = float(parkinglot.get("daytariff", 999))
+def _timestamp_us(data, field):
+    seconds = data.get(field + "_ts")
+    if seconds is None:
+        seconds = timestamps.parse(data[field])
+    return seconds * 10**6
 
-    return (price, hours, diff.days + 1 if end.date() > start.date() else 0)
 
+def _now_us():
+    now = datetime.now()
+    return timestamps.to_epoch(now) * 10**6 + now.microsecond
+
+
+def session_columns(rows):
+    # (parkinglot, session) pairs -> the columns calculate_prices takes.
+    # Open sessions are priced up to now, like calculate_price does.
+    now = _now_us()
+    started, stopped, tariffs, daytariffs = [], [], [], []
+    for parkinglot, data in rows:
+        started.append(_timestamp_us(data, "started"))
+        stopped.append(_timestamp_us(data, "stopped") if data.get("stopped") else now)
+        tariffs.append(parkinglot.get("tariff"))
+        daytariffs.append(parkinglot.get("daytariff", 999))
+    return started, stopped, tariffs, daytariffs
+
+
+def _tariff_column(values):
+    # float64 column of tariffs and a mask of those float() rejects (a lot
+    # without a tariff, for one); NaN stands in for them.
+    column, invalid = [], []
+    for value in values:
+        try:
+            column.append(float(value))
+            invalid.append(False)
+        except (TypeError, ValueError):
+            column.append(math.nan)
+            invalid.append(True)
+    return np.asarray(column, dtype=np.float64), np.asarray(invalid, dtype=bool)
+
+
+def calculate_prices(started, stopped, tariffs, daytariffs):
+    # Returns (prices, hours, days) with the values calculate_price returns
+    # for each session: NumPy arrays when it is installed, lists otherwise.
+    # Tariffs are taken as the lots hold them; like calculate_price, a
+    # missing or invalid one only raises for a session whose price needs it.
+    if np is None:
+        results = [_price(*row) for row in zip(started, stopped, tariffs, daytariffs)]
+        return [row[0] for row in results], [row[1] for row in results], [row[2] for row in results]
+    started = np.asarray(started, dtype=np.int64)
+    stopped = np.asarray(stopped, dtype=np.int64)
+    hourly_tariffs, invalid_tariffs = _tariff_column(tariffs)
+    day_tariffs, invalid_daytariffs = _tariff_column(daytariffs)
+    diff = stopped - started
+    seconds = diff / 10**6
+    hours = np.ceil(seconds / 3600).astype(np.int64)
+    days = diff // US_PER_DAY + 1
+    next_day = stopped // US_PER_DAY > started // US_PER_DAY
+    free = seconds < 180
+    needs_tariff = ~free & ~next_day
+    invalid = (needs_tariff & invalid_tariffs) | (~free & invalid_daytariffs)
+    if invalid.any():
+        row = int(np.argmax(invalid))
+        # The error _price raises for that session.
+        float(tariffs[row] if needs_tariff[row] and invalid_tariffs[row] else daytariffs[row])
+    hourly = hourly_tariffs * hours
+    hourly = np.where(hourly > day_tariffs, day_tariffs, hourly)
+    prices = np.where(free, 0.0, np.where(next_day, day_tariffs * days, hourly))
+    return prices, hours, np.where(next_day, days, 0)
 
 
 def generate_payment_hash(sid, data):
@@ -38,11 +121,4 @@ def generate_transaction_validation_hash():
     return str(uuid.uuid4())
 
 def check_payment_amount(hash):
-    payments = load_payment_data()
-    total = 0
-
-    for payment in payments:
-        if payment["transaction"] == hash:
-            total += payment["amount"]
-
-    return total
\ No newline at end of file
+    return indexes.payment_totals().get(hash, 0)
\ No newline at end of file
@@ -1,10 +1,212 @@
-sessions = {}
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import codec
+import config
+
+# Login tokens. Each token expires SESSION_TTL seconds after it was last used
+# (sliding expiry) and at most SESSION_MAX_TOKENS are kept; past that the
+# least recently used token is dropped. Tokens are kept in least recently
+# used order, so expired ones are always at the front and a sweep stops at
+# the first live token. With SESSION_SNAPSHOT set the store is written to
+# that file on every sweep and at shutdown and read back at startup, so a
+# restart does not log every terminal out.
+
+
+class TokenStore:
+    def __init__(self, ttl, max_tokens):
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+        self.tokens = OrderedDict()
+        self.lock = threading.Lock()
+        self.changed = False
+
+    def add(self, token, user):
+        with self.lock:
+            self.tokens[token] = (user, time.time() + self.ttl)
+            self.tokens.move_to_end(token)
+            while len(self.tokens) > self.max_tokens:
+                self.tokens.popitem(last=False)
+            self.changed = True
+
+    def get(self, token):
+        with self.lock:
+            entry = self.tokens.get(token)
+            if entry is None:
+                return None
+            now = time.time()
+            if entry[1] <= now:
+                del self.tokens[token]
+                self.changed = True
+                return None
+            self.tokens[token] = (entry[0], now + self.ttl)
+            self.tokens.move_to_end(token)
+            return entry[0]
+
+    def remove(self, token):
+        with self.lock:
+            entry = self.tokens.pop(token, None)
+            self.changed = self.changed or entry is not None
+            return entry[0] if entry else None
+
+    def sweep(self):
+        now = time.time()
+        removed = 0
+        with self.lock:
+            while self.tokens:
+                token, (user, expires) = next(iter(self.tokens.items()))
+                if expires > now:
+                    break
+                del self.tokens[token]
+                removed += 1
+            self.changed = self.changed or removed > 0
+        return removed
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def save_snapshot(self, filename):
+        with self.lock:
+            if not self.changed:
+                return
+            entries = [[token, user, expires] for token, (user, expires) in self.tokens.items()]
+            self.changed = False
+        temp = f"{filename}.tmp"
+        with open(os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as file:
+            file.write(codec.encode(entries))
+        os.replace(temp, filename)
+
+    def load_snapshot(self, filename, resolve=lambda user: user):
+        # resolve maps a saved user to the current record, None drops the token.
+        try:
+            entries = codec.load(filename)
+        except (FileNotFoundError, ValueError):
+            return 0
+        now = time.time()
+        with self.lock:
+            for token, user, expires in entries:
+                user = resolve(user) if expires > now else None
+                if user is not None and token not in self.tokens:
+                    self.tokens[token] = (user, expires)
+            while len(self.tokens) > self.max_tokens:
+                self.tokens.popitem(last=False)
+        return len(self.tokens)
+
+
+class SQLiteTokenStore:
+    # Token store shared by several server processes through an SQLite file.
+    # Every process caches the tokens it has seen and only asks the database
+    # again after cache_seconds, so a token logged out or expired elsewhere is
+    # honoured here within that delay. The sliding expiry is written back at
+    # most once per cache period per token. The database is the persistent
+    # copy, so there is no snapshot to save or load.
+
+    def __init__(self, filename, ttl, max_tokens, cache_seconds):
+        self.filename = filename
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+        self.cache_seconds = cache_seconds
+        self.cache = {}
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.filename, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS tokens (token TEXT PRIMARY KEY, user TEXT NOT NULL, expires REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS tokens_expires ON tokens (expires)")
+            self.local.conn = conn
+        return conn
+
+    def reset(self):
+        # Forked processes must open their own connections and start cold.
+        self.local = threading.local()
+        self.cache = {}
+
+    def add(self, token, user):
+        expires = time.time() + self.ttl
+        self.connection().execute("INSERT OR REPLACE INTO tokens (token, user, expires) VALUES (?, ?, ?)", (token, codec.dumps(user), expires))
+        self.cache[token] = (user, time.time())
+
+    def get(self, token):
+        now = time.time()
+        cached = self.cache.get(token)
+        if cached is not None and now - cached[1] < self.cache_seconds:
+            return cached[0]
+        conn = self.connection()
+        row = conn.execute("SELECT user, expires FROM tokens WHERE token = ?", (token,)).fetchone()
+        if row is None or row[1] <= now:
+            self.cache.pop(token, None)
+            if row is not None:
+                conn.execute("DELETE FROM tokens WHERE token = ?", (token,))
+            return None
+        conn.execute("UPDATE tokens SET expires = ? WHERE token = ?", (now + self.ttl, token))
+        user = cached[0] if cached is not None else codec.loads(row[0])
+        self.cache[token] = (user, now)
+        return user
+
+    def remove(self, token):
+        cached = self.cache.pop(token, None)
+        conn = self.connection()
+        row = conn.execute("SELECT user FROM tokens WHERE token = ?", (token,)).fetchone()
+        conn.execute("DELETE FROM tokens WHERE token = ?", (token,))
+        return cached[0] if cached else codec.loads(row[0]) if row else None
+
+    def sweep(self):
+        now = time.time()
+        for token, (user, checked) in list(self.cache.items()):
+            if now - checked >= self.cache_seconds:
+                self.cache.pop(token, None)
+        conn = self.connection()
+        removed = conn.execute("DELETE FROM tokens WHERE expires <= ?", (now,)).rowcount
+        # Expiry slides with use, so the earliest expiries are the least
+        # recently used tokens.
+        removed += conn.execute("DELETE FROM tokens WHERE token IN (SELECT token FROM tokens ORDER BY expires DESC LIMIT -1 OFFSET ?)", (self.max_tokens,)).rowcount
+        return removed
+
+    def __len__(self):
+        return self.connection().execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+
+    def save_snapshot(self, filename):
+        pass
+
+    def load_snapshot(self, filename, resolve=lambda user: user):
+        return len(self)
+
+
+def make_store():
+    if config.SESSION_STORE == 'sqlite':
+        return SQLiteTokenStore(config.SESSION_DB, config.SESSION_TTL, config.SESSION_MAX_TOKENS, config.SESSION_CACHE_SECONDS)
+    return TokenStore(config.SESSION_TTL, config.SESSION_MAX_TOKENS)
+
+
+store = make_store()
+
 
 def add_session(token, user):
-    sessions[token] = user
+    store.add(token, user)
 
 def remove_session(token):
-    return sessions.pop(token, None)
+    return store.remove(token)
 
 def get_session(token):
-    return sessions.get(token)
\ No newline at end of file
+    return store.get(token)
+
+
+def start_sweeper(interval=None, snapshot=None):
+    interval = interval or config.SESSION_SWEEP_INTERVAL
+    snapshot = snapshot if snapshot is not None else config.SESSION_SNAPSHOT
+
+    def run():
+        while True:
+            time.sleep(interval)
+            store.sweep()
+            if snapshot:
+                store.save_snapshot(snapshot)
+
+    thread = threading.Thread(target=run, name="token-sweeper", daemon=True)
+    thread.start()
+    return thread
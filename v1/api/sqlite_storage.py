@@ -0,0 +1,183 @@
+import re
+import sqlite3
+import threading
+import codec
+import config
+
+# SQLite implementation of the JSON datasets in data/. Every record is kept as
+# its JSON text under its key. Users also have a username column and index so
+# a login finds its user without loading the users; sessions, payments and
+# reservations are looked up through the in-memory indexes (indexes.py) like
+# with the file backends, so their tables have no other columns or indexes.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (filename TEXT PRIMARY KEY, version INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS users (pos INTEGER PRIMARY KEY, username TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS users_username ON users (username);
+CREATE TABLE IF NOT EXISTS parking_lots (id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS reservations (id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS payments (pos INTEGER PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS sessions (lot TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, PRIMARY KEY (lot, id));
+CREATE TABLE IF NOT EXISTS vehicles (user TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, PRIMARY KEY (user, id));
+-- Secondary indexes of earlier databases, no longer queried.
+DROP INDEX IF EXISTS reservations_user;
+DROP INDEX IF EXISTS reservations_licenseplate;
+DROP INDEX IF EXISTS payments_thash;
+DROP INDEX IF EXISTS sessions_licenseplate;
+DROP INDEX IF EXISTS sessions_user;
+DROP INDEX IF EXISTS sessions_lot_stopped;
+DROP INDEX IF EXISTS vehicles_licenseplate;
+"""
+
+# Extracted columns of earlier databases, dropped on connect (SQLite 3.35+;
+# older versions keep them, unread).
+STALE_COLUMNS = {
+    'reservations': ('user', 'licenseplate', 'parkinglot'),
+    'payments': ('thash',),
+    'sessions': ('licenseplate', 'user', 'stopped'),
+    'vehicles': ('licenseplate',),
+}
+
+TABLES = {
+    'data/users.json': 'users',
+    'data/parking-lots.json': 'parking_lots',
+    'data/reservations.json': 'reservations',
+    'data/payments.json': 'payments',
+    'data/vehicles.json': 'vehicles',
+}
+
+# Table columns: the key columns and the record fields kept as columns.
+COLUMNS = {
+    'users': (('pos',), ('username',)),
+    'parking_lots': (('id',), ()),
+    'reservations': (('id',), ()),
+    'payments': (('pos',), ()),
+    'sessions': (('lot', 'id'), ()),
+    'vehicles': (('user', 'id'), ()),
+}
+
+_local = threading.local()
+
+
+def connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(config.SQLITE_PATH, timeout=30)
+        conn.executescript(SCHEMA)
+        _drop_stale_columns(conn)
+        _local.conn = conn
+    return conn
+
+
+def _stale_columns(conn):
+    return [(table, column) for table, columns in STALE_COLUMNS.items()
+            for column in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")} & set(columns)]
+
+
+def _drop_stale_columns(conn):
+    if sqlite3.sqlite_version_info < (3, 35) or not _stale_columns(conn):
+        return
+    with conn:
+        # Looked up again under the write lock, another connection may have
+        # dropped them meanwhile.
+        conn.execute("BEGIN IMMEDIATE")
+        for table, column in _stale_columns(conn):
+            conn.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+
+
+def reset():
+    # Forked processes must open their own connections.
+    global _local
+    _local = threading.local()
+
+
+def dataset(filename):
+    match = re.match(r'data/pdata/p(.+)-sessions\.json$', filename)
+    if match:
+        return 'sessions', match.group(1)
+    return TABLES.get(filename), None
+
+
+def handles(filename):
+    return dataset(filename)[0] is not None
+
+
+def _rows(table, lot, key, value):
+    keys, extra = COLUMNS[table]
+    if table == 'vehicles':
+        return [(key, vid, codec.dumps(vehicle)) for vid, vehicle in value.items()]
+    prefix = (lot, key) if table == 'sessions' else (key,)
+    return [prefix + tuple(value.get(column) or None for column in extra) + (codec.dumps(value),)]
+
+
+def _insert(conn, table, rows):
+    keys, extra = COLUMNS[table]
+    columns = keys + extra + ('data',)
+    updates = ', '.join(f'{column} = excluded.{column}' for column in extra + ('data',))
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}", rows)
+
+
+def _where(table, lot):
+    return ('WHERE lot = ?', (lot,)) if table == 'sessions' else ('', ())
+
+
+def _bump(conn, filename):
+    conn.execute("INSERT INTO versions (filename, version) VALUES (?, 1) "
+                 "ON CONFLICT (filename) DO UPDATE SET version = version + 1", (filename,))
+
+
+def version(filename):
+    row = connection().execute("SELECT version FROM versions WHERE filename = ?", (filename,)).fetchone()
+    return (row[0] if row else 0,)
+
+
+def load(filename):
+    table, lot = dataset(filename)
+    keys, _ = COLUMNS[table]
+    where, params = _where(table, lot)
+    rows = connection().execute(f"SELECT {', '.join(keys)}, data FROM {table} {where} ORDER BY rowid", params)
+    if table in ('users', 'payments'):
+        return [codec.loads(row[-1]) for row in rows]
+    if table == 'vehicles':
+        vehicles = {}
+        for user, vid, data in rows:
+            vehicles.setdefault(user, {})[vid] = codec.loads(data)
+        return vehicles
+    return {row[-2]: codec.loads(row[-1]) for row in rows}
+
+
+def save(filename, data):
+    table, lot = dataset(filename)
+    where, params = _where(table, lot)
+    items = enumerate(data) if isinstance(data, list) else data.items()
+    conn = connection()
+    with conn:
+        conn.execute(f"DELETE FROM {table} {where}", params)
+        _insert(conn, table, [row for key, value in items for row in _rows(table, lot, key, value)])
+        _bump(conn, filename)
+
+
+def save_records(filename, data, keys):
+    table, lot = dataset(filename)
+    key_columns, _ = COLUMNS[table]
+    conn = connection()
+    with conn:
+        for key in keys:
+            present = key < len(data) if isinstance(data, list) else key in data
+            if table == 'vehicles':
+                conn.execute("DELETE FROM vehicles WHERE user = ?", (key,))
+            elif not present and table == 'sessions':
+                conn.execute("DELETE FROM sessions WHERE lot = ? AND id = ?", (lot, key))
+            elif not present:
+                conn.execute(f"DELETE FROM {table} WHERE {key_columns[0]} = ?", (key,))
+            if present:
+                _insert(conn, table, _rows(table, lot, key, data[key]))
+        _bump(conn, filename)
+
+
+def find_user(username):
+    row = connection().execute("SELECT data FROM users WHERE username = ? ORDER BY pos LIMIT 1", (username,)).fetchone()
+    return codec.loads(row[0]) if row else None
+
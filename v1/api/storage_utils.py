@@ -1,16 +1,61 @@
-import json
 import csv
+import os
+import threading
+import archive
+import codec
+import config
+import journal
+import locks
+import records
+import sqlite_storage
 
 def load_json(filename):
     try:
-        with open(filename, 'r') as file:
-            return json.load(file)
+        return codec.load(filename)
     except FileNotFoundError:
-        return []
+        # A lot without sessions yet has no sessions file.
+        return {} if archive.is_sessions_file(filename) else []
 
 def write_json(filename, data):
-    with open(filename, 'w') as file:
-        json.dump(data, file, default=str)
+    # UTF-8 bytes whatever the locale, as codec.load reads them.
+    payload = codec.encode(archive.document(data))
+    atomic_write(filename, lambda file: file.write(payload), binary=True)
+
+# Writes go to a temporary file next to the target, are fsynced and renamed
+# over it, so a reader or a crash sees the old or the new file but never a
+# partial one. The rename is done under an exclusive flock() on the dataset's
+# lock file (see locks.py), which other processes and tools writing the
+# data directory take as well.
+
+def atomic_write(filename, write, newline=None, binary=False):
+    with locks.file_locked(filename):
+        replace(write_temp(filename, write, newline, binary), filename)
+
+def write_temp(filename, write, newline=None, binary=False):
+    temp = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp, 'wb') if binary else open(temp, 'w', newline=newline) as file:
+            write(file)
+            file.flush()
+            if config.WRITE_FSYNC:
+                os.fsync(file.fileno())
+    except BaseException:
+        try:
+            os.remove(temp)
+        except FileNotFoundError:
+            pass
+        raise
+    return temp
+
+def replace(temp, filename):
+    os.replace(temp, filename)
+    if config.WRITE_FSYNC and hasattr(os, 'O_DIRECTORY'):
+        # The rename itself is only durable once the directory is synced.
+        fd = os.open(os.path.dirname(filename) or '.', os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
 
 def load_csv(filename):
     try:
@@ -21,10 +66,7 @@ def load_csv(filename):
         return []
 
 def write_csv(filename, data):
-    with open(filename, 'w', newline='') as file:
-        writer = csv.writer(file)
-        for row in data:
-            writer.writerow(row)
+    atomic_write(filename, lambda file: csv.writer(file).writerows(data), newline='')
 
 def load_text(filename):
     try:
@@ -34,12 +76,56 @@ def load_text(filename):
         return []
 
 def write_text(filename, data):
-    with open(filename, 'w') as file:
-        for line in data:
-            file.write(line + '\n')
+    atomic_write(filename, lambda file: file.writelines(line + '\n' for line in data))
+
+def uses_sqlite(filename):
+    return config.STORAGE_BACKEND == 'sqlite' and sqlite_storage.handles(filename)
+
+def is_journaled(filename):
+    if config.STORAGE_BACKEND != 'journal':
+        return False
+    if filename in ('data/payments.json', 'data/reservations.json'):
+        return True
+    return filename.startswith('data/pdata/') and filename.endswith('-sessions.json')
+
+def whole_file(filename):
+    # Datasets saved by rewriting the whole JSON file on every change.
+    return filename.endswith('.json') and not uses_sqlite(filename) and not is_journaled(filename)
+
+def data_version(filename):
+    if uses_sqlite(filename):
+        return sqlite_storage.version(filename)
+    version = []
+    paths = [filename, journal.journal_path(filename)] if is_journaled(filename) else [filename]
+    if archive.is_sessions_file(filename):
+        paths.append(archive.archive_path(filename))
+    for path in paths:
+        try:
+            # Size and inode as well: another process may rewrite the file
+            # within the mtime granularity.
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+def save_records(filename, data, keys):
+    if uses_sqlite(filename):
+        sqlite_storage.save_records(filename, data, keys)
+    elif is_journaled(filename):
+        if journal.append(filename, data, keys) >= config.JOURNAL_COMPACT_EVERY:
+            save_data(filename, data)
+    else:
+        save_data(filename, data)
 
 def save_data(filename, data):
-    if filename.endswith('.json'):
+    if uses_sqlite(filename):
+        sqlite_storage.save(filename, data)
+    elif is_journaled(filename):
+        # Compaction: the full snapshot replaces the journal.
+        write_json(filename, data)
+        journal.truncate(filename)
+    elif filename.endswith('.json'):
         write_json(filename, data)
     elif filename.endswith('.csv'):
         write_csv(filename, data)
@@ -49,8 +135,12 @@ def save_data(filename, data):
         raise ValueError("Unsupported file format") 
 
 def load_data(filename):
-    if filename.endswith('.json'):
-        return load_json(filename)
+    if uses_sqlite(filename):
+        return records.compact(filename, sqlite_storage.load(filename))
+    elif is_journaled(filename):
+        return journal.replay(filename, archive.merge(filename, records.compact(filename, load_json(filename))))
+    elif filename.endswith('.json'):
+        return archive.merge(filename, records.compact(filename, load_json(filename)))
     elif filename.endswith('.csv'):
         return load_csv(filename)
     elif filename.endswith('.txt'):
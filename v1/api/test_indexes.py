@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+import config
+import indexes
+import repository
+import storage_utils
+
+# Index building over lots without a sessions file.
+# Usage: python -m pytest test_indexes.py (or python -m unittest test_indexes)
+
+
+class MissingSessionsFileTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = config.STORAGE_BACKEND
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.makedirs('data/pdata')
+        repository.datasets.clear()
+        indexes.user_lots.clear()
+        storage_utils.write_json('data/parking-lots.json', {"1": {"name": "L1", "capacity": 5, "tariff": 2, "daytariff": 20}})
+
+    def tearDown(self):
+        config.STORAGE_BACKEND = self.backend
+        repository.datasets.clear()
+        indexes.user_lots.clear()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_lot_without_sessions_file(self):
+        for backend in ('json', 'journal'):
+            with self.subTest(backend=backend):
+                config.STORAGE_BACKEND = backend
+                repository.datasets.clear()
+                indexes.build_indexes()
+                self.assertEqual(repository.load(indexes.sessions_file("1")), {})
+                self.assertEqual(indexes.lot_users("1"), {})
+                self.assertIsNone(indexes.find_open_session("1", "AA-1"))
+                self.assertEqual(indexes.occupancy("1")["free"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+import config
+import journal
+import storage_utils
+
+# Journal recovery after a crash during an append.
+# Usage: python -m pytest test_journal.py (or python -m unittest test_journal)
+
+FILENAME = 'data/pdata/p1-sessions.json'
+
+
+class TornAppendTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = config.STORAGE_BACKEND
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.makedirs('data/pdata')
+        config.STORAGE_BACKEND = 'journal'
+        storage_utils.write_json(FILENAME, {})
+
+    def tearDown(self):
+        config.STORAGE_BACKEND = self.backend
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def session(self, plate):
+        return {"licenseplate": plate, "started": "01-01-2024 10:00:00", "stopped": None, "user": "bob"}
+
+    def test_records_after_a_partial_line_are_kept(self):
+        sessions = {"1": self.session("AA-1")}
+        storage_utils.save_records(FILENAME, sessions, ["1"])
+        with open(journal.journal_path(FILENAME), 'a') as file:
+            file.write('{"k": "2", "v": {"licen')
+        sessions = storage_utils.load_data(FILENAME)
+        self.assertEqual(list(sessions), ["1"])
+        sessions["2"] = self.session("AA-2")
+        sessions["3"] = self.session("AA-3")
+        storage_utils.save_records(FILENAME, sessions, ["2"])
+        storage_utils.save_records(FILENAME, sessions, ["3"])
+        self.assertEqual(storage_utils.load_data(FILENAME), sessions)
+
+    def test_append_after_a_record_without_newline(self):
+        storage_utils.save_records(FILENAME, {"1": self.session("AA-1")}, ["1"])
+        path = journal.journal_path(FILENAME)
+        with open(path, 'rb+') as file:
+            file.truncate(os.path.getsize(path) - 1)
+        sessions = storage_utils.load_data(FILENAME)
+        sessions["2"] = self.session("AA-2")
+        storage_utils.save_records(FILENAME, sessions, ["2"])
+        self.assertEqual(storage_utils.load_data(FILENAME), sessions)
+
+
+if __name__ == "__main__":
+    unittest.main()
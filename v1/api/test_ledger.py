@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+import config
+import indexes
+import ledger
+import repository
+import storage_utils
+import timestamps
+from handlers import billing, sessions as session_handlers
+
+# Billing ledger rows after sessions are deleted and new ones started.
+# Usage: python -m pytest test_ledger.py (or python -m unittest test_ledger)
+
+FILENAME = indexes.sessions_file("1")
+STARTED = timestamps.parse("01-01-2024 10:00:00")
+
+
+class ReusedSidTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = config.STORAGE_BACKEND
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.makedirs('data/pdata')
+        config.STORAGE_BACKEND = 'json'
+        repository.datasets.clear()
+        indexes.user_lots.clear()
+        storage_utils.write_json('data/parking-lots.json', {"1": {"name": "L1", "capacity": 5, "tariff": 2, "daytariff": 20}})
+        storage_utils.write_json('data/payments.json', [])
+        storage_utils.write_json(FILENAME, {})
+        indexes.build_indexes()
+        for plate in ("AA", "BB", "CC"):
+            self.park(plate, 3600 * 10)
+
+    def tearDown(self):
+        config.STORAGE_BACKEND = self.backend
+        repository.datasets.clear()
+        indexes.user_lots.clear()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def park(self, plate, seconds):
+        # What the start and stop handlers do.
+        sessions = repository.load(FILENAME)
+        sid, session = session_handlers._open("1", sessions, plate, "bob", STARTED)
+        repository.save_record(FILENAME, sessions, sid)
+        indexes.session_saved("1", sid, session)
+        timestamps.stamp(session, "stopped", STARTED + seconds)
+        repository.save_record(FILENAME, sessions, sid)
+        indexes.session_changed("1", sid, session)
+        ledger.session_closed("1", sid, session)
+        return sid
+
+    def bill(self):
+        rows, _ = billing.billing_rows("bob", {})
+        return [(row["session"]["licenseplate"], row["amount"]) for row in rows]
+
+    def test_session_started_after_a_delete(self):
+        self.assertEqual(self.bill(), [("AA", 20.0), ("BB", 20.0), ("CC", 20.0)])
+        sessions = repository.load(FILENAME)
+        session = sessions.pop("2")
+        repository.save_record(FILENAME, sessions, "2")
+        indexes.session_deleted("1", "2", session)
+        ledger.session_deleted("1", "2", session)
+        self.assertEqual(self.park("NEW", 3600), "4")
+        self.assertEqual(self.bill(), [("AA", 20.0), ("CC", 20.0), ("NEW", 2.0)])
+
+    def test_closing_replaces_the_row_of_the_sid(self):
+        self.bill()
+        sessions = repository.load(FILENAME)
+        session = dict(sessions["3"], licenseplate="DD")
+        timestamps.stamp(session, "stopped", STARTED + 3600)
+        sessions["3"] = session
+        repository.save_record(FILENAME, sessions, "3")
+        ledger.session_closed("1", "3", session)
+        self.assertEqual(self.bill(), [("AA", 20.0), ("BB", 20.0), ("DD", 2.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+from datetime import datetime, date
+
+# Timestamps are stored as "%d-%m-%Y %H:%M:%S" strings and, next to them, as
+# integer epoch seconds in a "<field>_ts" field. The epoch is the naive wall
+# clock (seconds since 1970-01-01 00:00:00 without a timezone), so it converts
+# to and from the string exactly and compares the same way. Records written
+# before the *_ts fields existed are read through epoch(), which falls back to
+# parsing the string (see migrate_timestamps.py to add the fields on disk).
+# Dates sent by clients, like reservation windows, may also be ISO dates.
+
+FORMAT = "%d-%m-%Y %H:%M:%S"
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+_days = {}
+_hours = {}
+_MINUTES = [f"{minute:02d}:{second:02d}" for minute in range(60) for second in range(60)]
+
+
+def parse(text):
+    # Fixed-format fast path for zero-padded strings, strptime for the rest
+    # and ISO dates ("2026-11-01", "2026-11-01T10:00:00") last.
+    if len(text) == 19 and text[2] == text[5] == '-' and text[13] == text[16] == ':':
+        day = _days.get(text[:10])
+        if day is None:
+            day = _days[text[:10]] = (date(int(text[6:10]), int(text[3:5]), int(text[0:2])).toordinal() - EPOCH_ORDINAL) * 86400
+        return day + int(text[11:13]) * 3600 + int(text[14:16]) * 60 + int(text[17:19])
+    try:
+        return to_epoch(datetime.strptime(text, FORMAT))
+    except ValueError:
+        return to_epoch(datetime.fromisoformat(text))
+
+
+def to_epoch(value):
+    return (value.toordinal() - EPOCH_ORDINAL) * 86400 + value.hour * 3600 + value.minute * 60 + value.second
+
+
+def to_datetime(seconds):
+    return datetime.fromordinal(EPOCH_ORDINAL + seconds // 86400).replace(hour=seconds % 86400 // 3600, minute=seconds % 3600 // 60, second=seconds % 60)
+
+
+def _hour_text(hour):
+    text = _hours[hour] = to_datetime(hour * 3600).strftime("%d-%m-%Y %H:")
+    return text
+
+
+def to_text(seconds):
+    # Cached text up to the hour plus minutes and seconds; strftime once per hour.
+    return (_hours.get(seconds // 3600) or _hour_text(seconds // 3600)) + _MINUTES[seconds % 3600]
+
+
+def to_texts(values):
+    # to_text of every value, for columns of epochs.
+    hours, minutes = _hours, _MINUTES
+    return [(hours.get(seconds // 3600) or _hour_text(seconds // 3600)) + minutes[seconds % 3600] for seconds in values]
+
+
+def now():
+    return to_epoch(datetime.now())
+
+
+def epoch(record, field):
+    # Epoch seconds of record[field], None when the field is empty or unreadable.
+    seconds = record.get(field + "_ts")
+    if seconds is not None:
+        return seconds
+    text = record.get(field)
+    if not text:
+        return None
+    try:
+        return parse(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def stamp(record, field, seconds=None):
+    # Sets record[field] and record[field + "_ts"] to the same moment.
+    seconds = now() if seconds is None else seconds
+    record[field] = to_text(seconds)
+    record[field + "_ts"] = seconds
+    return record
+
+
+def add_epochs(record, fields):
+    # Adds the missing *_ts fields of an existing record; returns whether it changed.
+    changed = False
+    for field in fields:
+        if field + "_ts" not in record and record.get(field):
+            seconds = epoch(record, field)
+            if seconds is not None:
+                record[field + "_ts"] = seconds
+                changed = True
+    return changed